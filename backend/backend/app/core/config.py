@@ -30,12 +30,72 @@ class Settings(BaseSettings):
 
     STRIPE_API_KEY: str = None
     STRIPE_WEBHOOK_SECRET: str = None
+    # max concurrent (blocking) stripe sdk calls per worker
+    STRIPE_MAX_CONCURRENCY: int = 4
 
     NETS_EASY_SECRET_KEY: str = None
     NETS_EASY_BASE_URL: str = None
     NETS_EASY_WEBHOOK_SECRET: str = None
+    NETS_EASY_MAX_CONCURRENCY: int = 5
+
+    # shared outbound http client pools (see utils/http.py)
+    HTTP_CLIENT_LIMIT: int = 100
+    HTTP_CLIENT_LIMIT_PER_HOST: int = 20
+    HTTP_CLIENT_KEEPALIVE: float = 30.0
+    HTTP_CLIENT_DNS_TTL: int = 300
+    HTTP_CLIENT_TIMEOUT: float = 10.0
+    HTTP_CLIENT_CONNECT_TIMEOUT: float = 5.0
+
+    # opening hours from kk.dk is cached in-process and by browsers/cdn
+    OPENING_HOURS_CACHE_TTL: int = 60 * 60
+    OPENING_HOURS_CACHE_MAX_STALE: int = 60 * 60 * 24
+
+    # member types and events are served with an etag - the version of the
+    # catalog is reused this long by each worker before asking the database
+    CATALOG_VERSION_TTL: float = 5
+
+    # identicons are cached by a hash of the email - in memory and if a
+    # directory is set also on disk (warm it with python -m backend.app.identicon)
+    # - browsers revalidate with the etag after max age as the email can change
+    IDENTICON_CACHE_SIZE: int = 1024
+    IDENTICON_CACHE_DIR: Optional[str] = None
+    IDENTICON_MAX_AGE: int = 60 * 60
+
+    # responses smaller than this are not worth compressing
+    COMPRESSION_MINIMUM_SIZE: int = 1024
+    # browser cache of the static assets (html is always revalidated)
+    STATIC_MAX_AGE: int = 60 * 60 * 24 * 7
+
+    # log every statement - far too much for production
+    SQL_ECHO: bool = False
+    # log statements slower than this (seconds) and optionally capture the plan
+    # of slow selects with EXPLAIN (ANALYZE, BUFFERS) in the background
+    SLOW_QUERY_THRESHOLD: Optional[float] = 0.5
+    SLOW_QUERY_EXPLAIN: bool = False
+    SLOW_QUERY_EXPLAIN_INTERVAL: int = 5 * 60
+
+    # log the statement count of every request and job and warn when the same
+    # statement runs QUERY_REPEAT_THRESHOLD times or more (an n+1)
+    QUERY_DEBUG: bool = False
+    QUERY_REPEAT_THRESHOLD: int = 3
+
+    # how often the event loop lag is measured and how long the loop may be
+    # blocked before the stack of the blocking code is logged
+    LOOP_MONITOR_INTERVAL: float = 0.1
+    LOOP_LAG_THRESHOLD: float = 0.25
+
+    # profiles of single requests asked for by an admin (X-Profile header or
+    # ?profile=1) - sampled every PROFILING_INTERVAL seconds
+    PROFILING_DIR: str = "/tmp/monkeybase-profiles"
+    PROFILING_INTERVAL: float = 0.001
+    PROFILING_KEEP: int = 50
+
+    # bearer token prometheus scrapes /metrics with - refused when not set
+    METRICS_API_KEY: Optional[str] = None
 
     DOOR_API_KEY: str = "asdf1234"
+    # lifetime of the signed offline door access tokens (qr codes)
+    DOOR_ACCESS_TOKEN_EXPIRE_MINUTES: int = 5
 
     # @validator("SENTRY_DSN", pre=True)
     # def sentry_dsn_can_be_blank(cls, v: str) -> Optional[str]:
@@ -68,6 +128,35 @@ class Settings(BaseSettings):
     SENDGRID_API_KEY: Optional[str] = None
     SENDGRID_FROM_EMAIL: Optional[EmailStr] = None
     SENDGRID_FROM_NAME: Optional[str] = None
+    SENDGRID_HOST: str = "https://api.sendgrid.com"
+    # outbox worker - how often to drain, how many emails to claim at a time,
+    # when to give up on an email that keeps failing and how many sendgrid
+    # requests a worker sends at once
+    EMAIL_OUTBOX_INTERVAL: int = 5
+    EMAIL_OUTBOX_BATCH_SIZE: int = 500
+    EMAIL_OUTBOX_MAX_ATTEMPTS: int = 5
+    EMAIL_OUTBOX_MAX_CONCURRENCY: int = 2
+
+    # fallback sweep of the webhook inbox - events are normally applied
+    # right after they are received
+    WEBHOOK_INBOX_INTERVAL: int = 30
+    WEBHOOK_INBOX_BATCH_SIZE: int = 100
+
+    # resolve pending slots whose payment webhook never arrived
+    PAYMENT_RECONCILE_CRON: str = "*/15 * * * *"
+    PAYMENT_RECONCILE_BATCH_SIZE: int = 50
+
+    # one process of the cluster runs the scheduled jobs - elected with a
+    # postgres advisory lock, checked every interval and given up when the
+    # database does not answer within the timeout
+    LEADER_HEARTBEAT_INTERVAL: float = 5
+    LEADER_TIMEOUT: float = 15
+
+    # scheduled jobs (see jobs.py) start up to JOB_JITTER seconds after their
+    # cron time, are cancelled after JOB_TIMEOUT and their runs kept this long
+    JOB_JITTER: float = 30
+    JOB_TIMEOUT: float = 10 * 60
+    JOB_RUN_RETENTION_DAYS: int = 90
 
     EMAIL_RESET_TOKEN_EXPIRE_HOURS: int = 48
 
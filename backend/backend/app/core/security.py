@@ -1,20 +1,33 @@
-from datetime import datetime, timedelta
-from typing import Optional
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from typing import TYPE_CHECKING, Optional, Tuple
 
+from dateutil.tz import UTC
 from fastapi.security import APIKeyCookie
-from fido2.server import Fido2Server
-from fido2.webauthn import PublicKeyCredentialRpEntity
 from jose import jwt
 from loguru import logger
 from passlib.context import CryptContext
 
 from .. import models
+from ..utils.models_utils import DoorAccessEnum
 from .config import settings
 
+if TYPE_CHECKING:
+    from fido2.server import Fido2Server
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
-rp = PublicKeyCredentialRpEntity(settings.WEBAUTHN_RP_ID, settings.WEBAUTHN_RP_NAME)
-fido2server = Fido2Server(rp)
+
+@lru_cache()
+def fido2_server() -> "Fido2Server":
+    """the webauthn server - fido2 pulls in cryptography so only built on first use"""
+    from fido2.server import Fido2Server
+    from fido2.webauthn import PublicKeyCredentialRpEntity
+
+    rp = PublicKeyCredentialRpEntity(settings.WEBAUTHN_RP_ID, settings.WEBAUTHN_RP_NAME)
+    return Fido2Server(rp)
+
+
 webauthn_state = APIKeyCookie(name="_state", auto_error=True)
 
 ALGORITHM = "HS256"
@@ -108,3 +121,46 @@ def verify_webauthn_staten_token(token: str) -> Optional[str]:
     except jwt.JWTError as ex:
         logger.exception(f"failed with {ex}")
         return None
+
+
+def generate_door_access_token(
+    user_id: int, door_access: DoorAccessEnum, date_end: date
+) -> Tuple[str, datetime]:
+    """the signed token and when it expires (utc)"""
+    now = datetime.utcnow()
+    # never valid beyond the last day of the membership (in local time)
+    membership_end = (
+        datetime.combine(date_end + timedelta(days=1), time(), tzinfo=settings.TZ)
+        .astimezone(UTC)
+        .replace(tzinfo=None)
+    )
+    exp = min(
+        now + timedelta(minutes=settings.DOOR_ACCESS_TOKEN_EXPIRE_MINUTES),
+        membership_end,
+    )
+    encoded_jwt = jwt.encode(
+        {
+            "exp": exp,
+            "nbf": now,
+            "aud": "door_access",
+            "sub": str(user_id),
+            "door_access": door_access,
+        },
+        settings.SECRET_KEY,
+        algorithm=ALGORITHM,
+    )
+    return encoded_jwt, exp
+
+
+def verify_door_access_token(token: str) -> Optional[dict]:
+    try:
+        # jose skips the audience check on tokens without one (eg. login tokens)
+        return jwt.decode(
+            token,
+            settings.SECRET_KEY,
+            audience="door_access",
+            algorithms=[ALGORITHM],
+            options={"require_aud": True},
+        )
+    except jwt.JWTError:
+        return None
@@ -1,12 +1,24 @@
+import asyncio
 import datetime
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum, unique
-from typing import Any, Dict, List
+from functools import lru_cache
+from itertools import chain, groupby
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
 
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Attachment, From, Mail
+from loguru import logger
 
+from .. import crud
+from ..db import AsyncSession
+from ..utils.metrics import EMAIL_OUTBOX_EMAILS, EMAIL_OUTBOX_SEND_DURATION
 from .config import settings
 
+if TYPE_CHECKING:
+    from sendgrid import SendGridAPIClient
+    from sendgrid.helpers.mail import Mail
+
 
 def tz_now():
     return datetime.datetime.now(settings.TZ)
@@ -26,28 +38,126 @@ class MailTemplateEnum(str, Enum):
     PAYMENT_SUCCEEDED: str = "ps1"
 
 
-sg_client = SendGridAPIClient(settings.SENDGRID_API_KEY)
+@lru_cache()
+def sendgrid_client() -> "SendGridAPIClient":
+    # the sendgrid sdk is slow to import - only done when sending the first email
+    from sendgrid import SendGridAPIClient
+
+    return SendGridAPIClient(settings.SENDGRID_API_KEY, host=settings.SENDGRID_HOST)
+
+
+# the blocking sendgrid requests get their own threads - a slow drain of
+# the outbox does not hold up the threadpool of the requests
+_executor = ThreadPoolExecutor(
+    max_workers=settings.EMAIL_OUTBOX_MAX_CONCURRENCY, thread_name_prefix="sendgrid"
+)
 
 
 def _sendgrid_send(message):
-    sg_client.send(message)
+    sendgrid_client().send(message)
+
+
+# throughput of the outbox worker since startup
+outbox_stats = Counter()
 
 
-def send_transactional_email(
+async def queue_transactional_email(
+    db: AsyncSession,
     to_email: str,
     template_id: str,
     data: Dict[Any, Any],
-    attachments: List[Attachment] = [],
 ):
+    """
+    add the email to the outbox - it is only sent if the callers transaction
+    is committed and then by the outbox worker
+    """
+    await crud.email_outbox.create(
+        db,
+        obj_in={"to_email": to_email, "template_id": template_id, "data": data},
+    )
+
+
+def _outbox_message(template_id: str, emails: List[Any]) -> "Mail":
+    from sendgrid.helpers.mail import From, Mail, Personalization, To
 
+    # one request per template - every recipient gets a personalization
+    # with their own dynamic template data
     message = Mail(
-        from_email=From(settings.SENDGRID_FROM_EMAIL, settings.SENDGRID_FROM_NAME),
-        to_emails=to_email,
+        from_email=From(settings.SENDGRID_FROM_EMAIL, settings.SENDGRID_FROM_NAME)
     )
     message.template_id = template_id
-    message.dynamic_template_data = data
-
-    for attachment in attachments:
-        message.add_attachment(attachment)
-
-    _sendgrid_send(message)
+    for email in emails:
+        personalization = Personalization()
+        personalization.add_to(To(email.to_email))
+        personalization.dynamic_template_data = email.data
+        message.add_personalization(personalization)
+    return message
+
+
+async def _send_group(
+    template_id: str, emails: List[Any]
+) -> List[Tuple[List[Any], Optional[str]]]:
+    """
+    send the emails of one template, returns them with the error they failed
+    with (None if sent) - a request sendgrid rejects (4xx) is split in halves
+    so only the bad recipients are charged an attempt
+    """
+    start = time.perf_counter()
+    try:
+        await asyncio.get_running_loop().run_in_executor(
+            _executor, _sendgrid_send, _outbox_message(template_id, emails)
+        )
+        error = None
+    except Exception as ex:
+        error = ex
+    elapsed = time.perf_counter() - start
+    outbox_stats["requests"] += 1
+    outbox_stats["send_seconds"] += elapsed
+    EMAIL_OUTBOX_SEND_DURATION.observe(elapsed)
+
+    if error is None:
+        return [(emails, None)]
+    status_code = getattr(error, "status_code", None) or 0
+    if len(emails) > 1 and 400 <= status_code < 500 and status_code != 429:
+        half = len(emails) // 2
+        first, second = await asyncio.gather(
+            _send_group(template_id, emails[:half]),
+            _send_group(template_id, emails[half:]),
+        )
+        return first + second
+    logger.warning(f"sending {len(emails)} {template_id} emails failed: {error}")
+    return [(emails, str(error))]
+
+
+async def send_outbox(db: AsyncSession) -> int:
+    """
+    send a batch of pending emails from the outbox, returns the number of
+    emails sent - the caller commits to release the claimed rows
+    """
+    emails = await crud.email_outbox.claim_pending(
+        db,
+        limit=settings.EMAIL_OUTBOX_BATCH_SIZE,
+        max_attempts=settings.EMAIL_OUTBOX_MAX_ATTEMPTS,
+    )
+    emails = sorted(emails, key=lambda e: e.template_id)
+    groups = [
+        (template_id, list(group))
+        for template_id, group in groupby(emails, key=lambda e: e.template_id)
+    ]
+    # the templates are sent at the same time - at most EMAIL_OUTBOX_MAX_CONCURRENCY
+    # requests run at once on the executor
+    results = await asyncio.gather(*(_send_group(t, g) for t, g in groups))
+
+    sent = 0
+    for group, error in chain.from_iterable(results):
+        ids = [email.id for email in group]
+        if error is None:
+            await crud.email_outbox.mark_sent(db, ids)
+            outbox_stats["sent"] += len(ids)
+            EMAIL_OUTBOX_EMAILS.labels("sent").inc(len(ids))
+            sent += len(ids)
+        else:
+            await crud.email_outbox.mark_failed(db, ids, error=error)
+            outbox_stats["failed"] += len(ids)
+            EMAIL_OUTBOX_EMAILS.labels("failed").inc(len(ids))
+    return sent
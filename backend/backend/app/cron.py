@@ -1,6 +1,16 @@
 import datetime
 
+from loguru import logger
+
 from . import crud, models, deps
+from .core.config import settings
+from .core.utils import send_outbox
+from .payments import (
+    apply_paid_payments,
+    paid_payment_ids,
+    pending_payment_slots,
+    process_inbox,
+)
 
 
 async def generate_slots():
@@ -73,3 +83,53 @@ async def generate_slots():
                                 + datetime.timedelta(days=2),
                             },
                         )
+
+
+async def send_emails():
+    """drain the email outbox - one transaction per batch"""
+    try:
+        async with deps.get_db_context() as db:
+            while True:
+                sent = await send_outbox(db)
+                await db.commit()
+                # a short batch means the outbox is drained, failures are
+                # retried on the next run
+                if sent < settings.EMAIL_OUTBOX_BATCH_SIZE:
+                    break
+    except Exception as ex:
+        logger.exception(f"email outbox failed: {ex}")
+
+
+async def process_webhooks():
+    """apply the stored webhook events - one transaction per event"""
+    try:
+        async with deps.get_db_context() as db:
+            while True:
+                processed = await process_inbox(db)
+                if processed < settings.WEBHOOK_INBOX_BATCH_SIZE:
+                    break
+    except Exception as ex:
+        logger.exception(f"webhook inbox failed: {ex}")
+
+
+async def reconcile_payments() -> int:
+    """
+    resolve pending slots whose payment webhook got lost - asks the payment
+    providers in bulk and applies the paid ones one transaction per batch -
+    errors are raised so the job run records them
+    """
+    async with deps.get_db_context() as db:
+        slots = await pending_payment_slots(db)
+        await db.commit()
+        if not slots:
+            return 0
+        paid = sorted(await paid_payment_ids(slots))
+        applied = 0
+        batch_size = settings.PAYMENT_RECONCILE_BATCH_SIZE
+        for i in range(0, len(paid), batch_size):
+            applied += await apply_paid_payments(db, paid[i : i + batch_size])
+            await db.commit()
+    logger.info(
+        f"reconciled payments: {len(slots)} pending {len(paid)} paid {applied} applied"
+    )
+    return applied
@@ -8,3 +8,7 @@ from .slot import slot
 from .waiting_list import waiting_list
 from .lock_table import lock_table
 from .door_event import door_event
+from .email_outbox import email_outbox
+from .webhook_inbox import webhook_inbox
+from .resource_version import resource_version
+from .job_run import job_run
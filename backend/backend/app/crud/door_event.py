@@ -1,9 +1,24 @@
+from typing import Any, Dict, List
+
+from sqlalchemy.dialects import postgresql as sa_pg
+
 from .. import models, schemas
+from ..db import AsyncSession
 from .base import CRUDBase
 
 
 class CRUDDoorEvent(CRUDBase[models.Doorevent, schemas.DoorEvent, schemas.DoorEvent]):
-    pass
+    async def create_multi(
+        self,
+        db: AsyncSession,
+        objs_in: List[Dict[str, Any]],
+    ) -> None:
+        # one bulk insert - replayed swipes hit the (user_id, created_at) pk
+        # so just skip those instead of failing the whole batch
+        if not objs_in:
+            return
+        query = sa_pg.insert(self.model).values(objs_in).on_conflict_do_nothing()
+        await db.execute(query)
 
 
 door_event = CRUDDoorEvent(models.Doorevent)
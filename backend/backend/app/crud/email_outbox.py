@@ -0,0 +1,71 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import pydantic
+import sqlalchemy as sa
+
+from .. import models
+from ..db import AsyncSession
+from ..utils.models_utils import utcnow
+from .base import CRUDBase
+
+
+class EmailOutboxSchema(pydantic.BaseModel):
+    to_email: str
+    template_id: str
+    data: Dict[str, Any] = {}
+    attempts: Optional[int]
+    sent_at: Optional[datetime]
+    last_error: Optional[str]
+
+
+class CRUDEmailOutbox(
+    CRUDBase[models.EmailOutbox, EmailOutboxSchema, EmailOutboxSchema]
+):
+    async def claim_pending(
+        self, db: AsyncSession, limit: int, max_attempts: int
+    ) -> List[models.EmailOutbox]:
+        # lock a batch of unsent emails - other workers skip the locked rows
+        # and pick the next batch instead of waiting on this one
+        query = (
+            sa.future.select(self.model)
+            .where(
+                self.model.sent_at.is_(None),
+                self.model.attempts < max_attempts,
+            )
+            .order_by(self.model.id.asc())
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        return (await db.execute(query)).scalars().all()
+
+    async def mark_sent(self, db: AsyncSession, ids: List[int]) -> None:
+        query = (
+            sa.update(self.model)
+            .where(self.model.id.in_(ids))
+            .values(
+                sent_at=utcnow(),
+                attempts=self.model.attempts + 1,
+                last_error=None,
+            )
+        )
+        await db.execute(query)
+
+    async def mark_failed(self, db: AsyncSession, ids: List[int], error: str) -> None:
+        query = (
+            sa.update(self.model)
+            .where(self.model.id.in_(ids))
+            .values(attempts=self.model.attempts + 1, last_error=error)
+        )
+        await db.execute(query)
+
+    async def count_pending(self, db: AsyncSession, max_attempts: int) -> int:
+        return await self.count(
+            db,
+            self.model.sent_at.is_(None),
+            self.model.attempts < max_attempts,
+            only_active=False,
+        )
+
+
+email_outbox = CRUDEmailOutbox(models.EmailOutbox)
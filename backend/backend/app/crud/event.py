@@ -6,6 +6,7 @@ from ..db import AsyncSession
 from ..models import Event
 from ..schemas import EventCreate, EventUpdate
 from .base import CRUDBase
+from .resource_version import resource_version
 
 
 class CRUDEvent(CRUDBase[Event, EventCreate, EventUpdate]):
@@ -17,6 +18,7 @@ class CRUDEvent(CRUDBase[Event, EventCreate, EventUpdate]):
         # ensure obj_type is set as insert doesnt seem to handle this on poly
         values = obj_in if isinstance(obj_in, dict) else obj_in.dict(exclude_unset=True)
         values["obj_type"] = self.model.__mapper_args__["polymorphic_identity"]
+        await resource_version.bump(db, "event")
         return await super().create(db, obj_in=values)
 
     async def update(
@@ -27,6 +29,7 @@ class CRUDEvent(CRUDBase[Event, EventCreate, EventUpdate]):
         multi: Optional[bool] = False,
         only_active: Optional[bool] = True,
     ) -> Event:
+        await resource_version.bump(db, "event")
         # ensure obj_type is an arg
         return await super().update(
             db,
@@ -43,6 +46,7 @@ class CRUDEvent(CRUDBase[Event, EventCreate, EventUpdate]):
         *args: List[sa.sql.elements.BinaryExpression],
         actual_delete: Optional[bool] = False,
     ) -> Event:
+        await resource_version.bump(db, "event")
         # ensure obj_type is an arg
         return await super().remove(
             db,
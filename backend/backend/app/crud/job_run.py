@@ -0,0 +1,37 @@
+from datetime import datetime
+from typing import Optional
+
+import pydantic
+import sqlalchemy as sa
+
+from .. import models
+from ..db import AsyncSession
+from .base import CRUDBase
+
+
+class JobRunSchema(pydantic.BaseModel):
+    name: str
+    scheduled_for: datetime
+    started_at: Optional[datetime]
+    finished_at: Optional[datetime]
+    duration: Optional[float]
+    error: Optional[str]
+
+
+class CRUDJobRun(CRUDBase[models.JobRun, JobRunSchema, JobRunSchema]):
+    async def last_scheduled_for(
+        self, db: AsyncSession, name: str
+    ) -> Optional[datetime]:
+        query = sa.select(sa.func.max(self.model.scheduled_for)).where(
+            self.model.name == name
+        )
+        return (await db.execute(query)).scalar()
+
+    async def prune(self, db: AsyncSession, name: str, before: datetime) -> None:
+        query = sa.delete(self.model).where(
+            self.model.name == name, self.model.started_at < before
+        )
+        await db.execute(query)
+
+
+job_run = CRUDJobRun(models.JobRun)
@@ -1,10 +1,23 @@
-from ..models import Member
+from typing import Any, Callable, List
+
+import sqlalchemy as sa
+
+from ..models import Member, Product, User
 from ..schemas import MemberCreate, MemberUpdate
 from .base import CRUDBase
 
 
 class CRUDMember(CRUDBase[Member, MemberCreate, MemberUpdate]):
-    pass
+    def load_options(self, includes: Callable[[str], bool]) -> List[Any]:
+        """eager load the active user and product - when they are included"""
+        options = []
+        if includes("user"):
+            options.append(sa.orm.selectinload(Member.user.and_(User.active == True)))
+        if includes("product"):
+            options.append(
+                sa.orm.selectinload(Member.product.and_(Product.active == True))
+            )
+        return options
 
 
 member = CRUDMember(Member)
@@ -6,6 +6,7 @@ from ..db import AsyncSession
 from ..models import MemberType
 from ..schemas import MemberTypeCreate, MemberTypeUpdate
 from .base import CRUDBase
+from .resource_version import resource_version
 
 
 class CRUDMemberType(CRUDBase[MemberType, MemberTypeCreate, MemberTypeUpdate]):
@@ -17,6 +18,7 @@ class CRUDMemberType(CRUDBase[MemberType, MemberTypeCreate, MemberTypeUpdate]):
         # ensure obj_type is set as insert doesnt seem to handle this on poly
         values = obj_in if isinstance(obj_in, dict) else obj_in.dict(exclude_unset=True)
         values["obj_type"] = self.model.__mapper_args__["polymorphic_identity"]
+        await resource_version.bump(db, "member_type")
         return await super().create(db, obj_in=values)
 
     async def update(
@@ -27,6 +29,7 @@ class CRUDMemberType(CRUDBase[MemberType, MemberTypeCreate, MemberTypeUpdate]):
         multi: Optional[bool] = False,
         only_active: Optional[bool] = True,
     ) -> MemberType:
+        await resource_version.bump(db, "member_type")
         # ensure obj_type is an arg
         return await super().update(
             db,
@@ -43,6 +46,7 @@ class CRUDMemberType(CRUDBase[MemberType, MemberTypeCreate, MemberTypeUpdate]):
         *args: List[sa.sql.elements.BinaryExpression],
         actual_delete: Optional[bool] = False,
     ) -> MemberType:
+        await resource_version.bump(db, "member_type")
         # ensure obj_type is an arg
         return await super().remove(
             db,
@@ -0,0 +1,63 @@
+import time
+from typing import Dict, Tuple
+
+import pydantic
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql as sa_pg
+
+from ..db import AsyncSession
+from ..models import ResourceVersion
+from .base import CRUDBase
+
+
+class ResourceVersionSchema(pydantic.BaseModel):
+    name: str
+    version: int
+
+
+class CRUDResourceVersion(
+    CRUDBase[ResourceVersion, ResourceVersionSchema, ResourceVersionSchema]
+):
+    def __init__(self, model):
+        super().__init__(model)
+        # name -> (fetched at, version) - shared by the requests of this worker
+        self._versions: Dict[str, Tuple[float, int]] = {}
+        # name -> times invalidated, a read started before is not cached
+        self._generations: Dict[str, int] = {}
+
+    def _invalidate(self, name: str):
+        self._generations[name] = self._generations.get(name, 0) + 1
+        self._versions.pop(name, None)
+
+    async def bump(self, db: AsyncSession, name: str) -> None:
+        # part of the callers transaction - so other workers see the new
+        # version when the change is committed
+        query = (
+            sa_pg.insert(self.model)
+            .values(name=name, version=1)
+            .on_conflict_do_update(
+                index_elements=[self.model.name],
+                set_={"version": self.model.version + 1},
+            )
+        )
+        await db.execute(query)
+        # forget the cached version once committed - before that the other
+        # requests of this worker would just cache the old one again
+        sa.event.listen(
+            db.sync_session, "after_commit", lambda _: self._invalidate(name), once=True
+        )
+
+    async def current(self, db: AsyncSession, name: str, max_age: float = 0) -> int:
+        """the version of the resource - reused up to max_age seconds"""
+        cached = self._versions.get(name)
+        if cached and time.monotonic() - cached[0] < max_age:
+            return cached[1]
+        generation = self._generations.get(name)
+        query = sa.select(self.model.version).where(self.model.name == name)
+        version = (await db.execute(query)).scalar() or 0
+        if self._generations.get(name) == generation:
+            self._versions[name] = (time.monotonic(), version)
+        return version
+
+
+resource_version = CRUDResourceVersion(ResourceVersion)
@@ -1,13 +1,22 @@
+from typing import Any, Callable, List
+
 import sqlalchemy as sa
 
 from ..db import AsyncSession
-from ..models import User
+from ..models import Member, Product, User
 from ..schemas import UserCreate, UserUpdate
 from .base import CRUDBase
 
 
 class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
-    pass
+    def load_options(self, includes: Callable[[str], bool]) -> List[Any]:
+        """eager load active memberships and their product - when included"""
+        if not includes("member"):
+            return []
+        member = sa.orm.selectinload(User.member.and_(Member.active == True))
+        if includes("member.product"):
+            member = member.selectinload(Member.product.and_(Product.active == True))
+        return [member]
 
 
 user = CRUDUser(User)
@@ -0,0 +1,62 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import pydantic
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql as sa_pg
+
+from .. import models
+from ..db import AsyncSession
+from ..utils.models_utils import utcnow
+from .base import CRUDBase
+
+
+class WebhookInboxSchema(pydantic.BaseModel):
+    provider: str
+    event_id: str
+    event_type: str
+    payload: Dict[str, Any]
+    processed_at: Optional[datetime]
+    error: Optional[str]
+
+
+class CRUDWebhookInbox(
+    CRUDBase[models.WebhookInbox, WebhookInboxSchema, WebhookInboxSchema]
+):
+    async def create_ignore(
+        self, db: AsyncSession, obj_in: Dict[str, Any]
+    ) -> Optional[int]:
+        # a redelivered event hits the (provider, event_id) constraint and
+        # is skipped - returns None in that case
+        query = (
+            sa_pg.insert(self.model)
+            .values(**obj_in)
+            .on_conflict_do_nothing(index_elements=["provider", "event_id"])
+            .returning(self.model.id)
+        )
+        return (await db.execute(query)).scalar_one_or_none()
+
+    async def claim_pending(
+        self, db: AsyncSession, limit: int
+    ) -> List[models.WebhookInbox]:
+        query = (
+            sa.future.select(self.model)
+            .where(self.model.processed_at.is_(None))
+            .order_by(self.model.id.asc())
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        return (await db.execute(query)).scalars().all()
+
+    async def mark_processed(
+        self, db: AsyncSession, id: int, error: Optional[str] = None
+    ) -> None:
+        query = (
+            sa.update(self.model)
+            .where(self.model.id == id)
+            .values(processed_at=utcnow(), error=error)
+        )
+        await db.execute(query)
+
+
+webhook_inbox = CRUDWebhookInbox(models.WebhookInbox)
@@ -1,14 +1,21 @@
+import os
+
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
 from ..core.config import settings
+from ..utils.metrics import instrument_engine
 
 DATABASE_URL = settings.SQLALCHEMY_DATABASE_URI.replace(
     "postgresql://", "postgresql+asyncpg://"
 )
 
-engine = create_async_engine(DATABASE_URL, echo=True, future=True)
+engine = create_async_engine(DATABASE_URL, echo=settings.SQL_ECHO, future=True)
+instrument_engine(engine)
+# with gunicorn's preload_app the engine is created in the master - a forked
+# worker must not use connections of its parent, so it starts with a new pool
+os.register_at_fork(after_in_child=lambda: engine.sync_engine.dispose(close=False))
 Base = declarative_base()
 async_session = sessionmaker(
     engine, class_=AsyncSession, expire_on_commit=False, future=True
@@ -1,12 +1,11 @@
 from contextlib import asynccontextmanager
-from typing import AsyncIterator, Optional
+from typing import Any, AsyncIterator, Dict, FrozenSet, Optional
 
 import aiohttp
-import stripe
 from fastapi import Depends, Header, HTTPException, Query, Request, Security, status
 from fastapi.security import OAuth2PasswordBearer, SecurityScopes
 from fastapi.security.api_key import APIKeyHeader
-from fastapi.security.http import HTTPBearer
+from fastapi.security.http import HTTPAuthorizationCredentials, HTTPBearer
 from jose import jwt
 from pydantic import ValidationError
 
@@ -14,6 +13,9 @@ from . import crud, models, schemas
 from .core import security
 from .core.config import settings
 from .db import AsyncSession, async_session
+from .utils.http import http_clients
+from .utils.serializer import included
+from .utils.stripe import sdk as stripe_sdk
 
 reusable_oauth2 = OAuth2PasswordBearer(
     tokenUrl="/auth/token",
@@ -24,6 +26,7 @@ reusable_oauth2 = OAuth2PasswordBearer(
 )
 stripe_signature_header = APIKeyHeader(name="stripe-signature", auto_error=True)
 netseasy_header = HTTPBearer()
+metrics_header = HTTPBearer(auto_error=False)
 
 
 @asynccontextmanager
@@ -37,9 +40,9 @@ async def get_db() -> AsyncIterator[AsyncSession]:
         yield session
 
 
-async def get_http_session() -> AsyncIterator[aiohttp.ClientSession]:
-    async with aiohttp.ClientSession() as session:
-        yield session
+async def get_http_session() -> aiohttp.ClientSession:
+    # shared pooled session - closed on app shutdown not per request
+    return http_clients.get()
 
 
 async def neteasy_auth(api_key: str = Security(netseasy_header)) -> str:
@@ -48,9 +51,22 @@ async def neteasy_auth(api_key: str = Security(netseasy_header)) -> str:
     raise HTTPException(status_code=status.HTTP_403_FORBIDDEN)
 
 
+async def metrics_auth(
+    api_key: Optional[HTTPAuthorizationCredentials] = Security(metrics_header),
+):
+    # no key configured - the app faces the internet so /metrics stays closed
+    if (
+        settings.METRICS_API_KEY is None
+        or api_key is None
+        or api_key.credentials != settings.METRICS_API_KEY
+    ):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN)
+
+
 async def get_stripe_webhook_event(
     request: Request, stripe_signature: str = Security(stripe_signature_header)
-) -> stripe.Event:
+) -> Any:
+    stripe = stripe_sdk()
     data = await request.body()
     try:
         event = stripe.Webhook.construct_event(
@@ -129,6 +145,48 @@ class Paging:
         self.per_page = per_page
 
 
+def _paths(value: Optional[str]) -> Optional[FrozenSet[str]]:
+    if value is None:
+        return None
+    return frozenset(path.strip() for path in value.split(",") if path.strip())
+
+
+class Fieldset:
+    """sparse fieldsets for list endpoints"""
+
+    def __init__(
+        self,
+        fields: Optional[str] = Query(
+            None,
+            description="comma separated fields to include, dotted for related "
+            "objects - eg. name,email,member.date_end - empty for all",
+        ),
+        expand: Optional[str] = Query(
+            None,
+            description="comma separated related objects to include, empty for "
+            "none - eg. member.product",
+        ),
+    ):
+        # no fields asked for is the same as leaving the parameter out
+        self.fields = _paths(fields) or None
+        self.expand = _paths(expand)
+
+    def includes(self, path: str) -> bool:
+        """should the relation at the dotted path be loaded"""
+        return included(self.fields, self.expand, path)
+
+    def page(self) -> Dict[str, Optional[FrozenSet[str]]]:
+        """the fieldset applied to the items of a paged response"""
+        return {
+            "fields": None
+            if self.fields is None
+            else frozenset(f"items.{f}" for f in self.fields),
+            "expand": None
+            if self.expand is None
+            else frozenset(["items", *(f"items.{e}" for e in self.expand)]),
+        }
+
+
 class Q:
     def __init__(
         self,
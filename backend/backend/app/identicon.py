@@ -0,0 +1,134 @@
+import asyncio
+import hashlib
+import hmac
+import io
+import os
+import tempfile
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+import sqlalchemy as sa
+from loguru import logger
+from starlette.concurrency import run_in_threadpool
+
+from . import models
+from .core.config import settings
+from .db import AsyncSession
+from .deps import get_db_context
+
+
+def identicon_key(email: str) -> str:
+    """the identicon only depends on the email - so this is its content address"""
+    return hashlib.sha256(email.encode()).hexdigest()
+
+
+def identicon_etag(email: str) -> str:
+    """keyed so the public etag can not be matched against a list of emails"""
+    key = settings.SECRET_KEY.encode()
+    return hmac.new(key, email.encode(), hashlib.sha256).hexdigest()
+
+
+def render(email: str) -> bytes:
+    import squares  # slow to import - only needed on a cache miss
+
+    img = squares.generate(email)
+    img = img.quantize(method=2)
+    with io.BytesIO() as bi:
+        img.save(bi, "png")
+        return bi.getvalue()
+
+
+class IdenticonCache:
+    """
+    Rendered identicons by key - an in-process lru in front of an optional
+    directory shared by the workers. Rendering and disk access runs in the
+    threadpool to keep it off the event loop.
+    """
+
+    def __init__(self, maxsize: int, directory: Optional[str] = None):
+        self.maxsize = maxsize
+        self.directory = Path(directory) if directory else None
+        self._images: "OrderedDict[str, bytes]" = OrderedDict()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.png"
+
+    def _read(self, key: str) -> Optional[bytes]:
+        try:
+            return self._path(key).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def _write(self, key: str, image: bytes):
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # write to a temp file and rename so other workers never read half a file
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(image)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def _load(self, key: str, email: str) -> bytes:
+        if self.directory:
+            if image := self._read(key):
+                return image
+        image = render(email)
+        if self.directory:
+            try:
+                self._write(key, image)
+            except OSError as e:
+                logger.warning(f"could not write identicon {key} to disk: {e}")
+        return image
+
+    def _remember(self, key: str, image: bytes):
+        self._images[key] = image
+        self._images.move_to_end(key)
+        while len(self._images) > self.maxsize:
+            self._images.popitem(last=False)
+
+    async def get(self, email: str) -> bytes:
+        key = identicon_key(email)
+        if image := self._images.get(key):
+            self._images.move_to_end(key)
+            return image
+        image = await run_in_threadpool(self._load, key, email)
+        self._remember(key, image)
+        return image
+
+    def clear(self):
+        self._images.clear()
+
+
+identicons = IdenticonCache(
+    maxsize=settings.IDENTICON_CACHE_SIZE, directory=settings.IDENTICON_CACHE_DIR
+)
+
+
+async def warm(db: AsyncSession, cache: IdenticonCache = identicons) -> int:
+    """render the identicons of all active users - returns how many"""
+    emails = (
+        await db.execute(sa.select(models.User.email).where(models.User.active == True))
+    ).scalars()
+    count = 0
+    for email in emails:
+        await cache.get(email)
+        count += 1
+    return count
+
+
+async def _main():
+    if not identicons.directory:
+        logger.warning("IDENTICON_CACHE_DIR is not set - nothing to warm")
+        return
+    async with get_db_context() as db:
+        count = await warm(db)
+    logger.info(f"warmed {count} identicons in {identicons.directory}")
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -0,0 +1,180 @@
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+from traceback import format_exception
+from typing import Any, Callable, Coroutine, Dict, List, Optional
+
+from croniter import croniter
+from loguru import logger
+from prometheus_client import Counter, Histogram
+
+from . import crud, models
+from .core.config import settings
+from .deps import get_db_context
+from .utils.leader import LeaderElection
+from .utils.metrics import track_queries
+from .utils.models_utils import utcnow
+
+JobFunc = Callable[[], Coroutine[Any, Any, None]]
+
+JOB_RUNS = Counter("job_runs", "Runs of the scheduled jobs", ["job", "result"])
+JOB_DURATION = Histogram(
+    "job_duration_seconds",
+    "Duration of the scheduled jobs",
+    ["job"],
+    buckets=(0.1, 0.5, 1, 5, 10, 30, 60, 120, 300, 600),
+)
+
+# wait this long before trying again when the job table can not be read
+RETRY_DELAY = 30
+
+
+class Job:
+    def __init__(
+        self,
+        name: str,
+        func: JobFunc,
+        cron: str,
+        jitter: float,
+        timeout: Optional[float],
+        catch_up: bool,
+        leader: Optional[LeaderElection],
+    ):
+        self.name = name
+        self.func = func
+        self.cron = cron
+        self.jitter = jitter
+        self.timeout = timeout
+        self.catch_up = catch_up
+        self.leader = leader
+
+
+class JobRegistry:
+    """
+    Named cron jobs with a history of their runs in the job_run table.
+
+    Every run is started up to jitter seconds after its cron time and
+    cancelled after timeout seconds. A run missed while no process was
+    running the job (a deploy, a failover) is caught up once right away -
+    later missed runs are coalesced into that one. With a leader the job
+    only runs in the process elected leader. The cron times are in utc.
+
+    A run cut short by shutdown is left without finished_at.
+    """
+
+    def __init__(self):
+        self.jobs: Dict[str, Job] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    def job(
+        self,
+        *,
+        cron: str,
+        name: Optional[str] = None,
+        jitter: Optional[float] = None,
+        timeout: Optional[float] = None,
+        catch_up: bool = True,
+        leader: Optional[LeaderElection] = None,
+    ) -> Callable[[JobFunc], JobFunc]:
+        """register the decorated coroutine function as a job"""
+        croniter(cron)  # fail at import on a bad expression
+
+        def decorator(func: JobFunc) -> JobFunc:
+            job_name = name or func.__name__
+            self.jobs[job_name] = Job(
+                name=job_name,
+                func=func,
+                cron=cron,
+                jitter=settings.JOB_JITTER if jitter is None else jitter,
+                timeout=settings.JOB_TIMEOUT if timeout is None else timeout,
+                catch_up=catch_up,
+                leader=leader,
+            )
+            return func
+
+        return decorator
+
+    async def _next_run(self, job: Job) -> datetime:
+        now = datetime.utcnow()
+        if job.catch_up:
+            async with get_db_context() as db:
+                last = await crud.job_run.last_scheduled_for(db, job.name)
+            previous = croniter(job.cron, now).get_prev(datetime)
+            if last is not None and previous > last:
+                logger.warning(f"job {job.name} missed its run at {previous}")
+                return previous
+        return croniter(job.cron, now).get_next(datetime)
+
+    async def run(self, job: Job, scheduled_for: datetime) -> models.JobRun:
+        async with get_db_context() as db:
+            job_run = await crud.job_run.create(
+                db, obj_in={"name": job.name, "scheduled_for": scheduled_for}
+            )
+            await db.commit()
+
+        start = time.perf_counter()
+        result, error = "ok", None
+        try:
+            with track_queries(job.name):
+                await asyncio.wait_for(job.func(), job.timeout)
+        except asyncio.TimeoutError:
+            result, error = "timeout", f"timed out after {job.timeout}s"
+        except Exception as exc:
+            result = "error"
+            error = "".join(format_exception(type(exc), exc, exc.__traceback__))
+        duration = time.perf_counter() - start
+        JOB_RUNS.labels(job.name, result).inc()
+        JOB_DURATION.labels(job.name).observe(duration)
+        if error:
+            logger.error(f"job {job.name} failed: {error}")
+
+        async with get_db_context() as db:
+            job_run = await crud.job_run.update(
+                db,
+                models.JobRun.id == job_run.id,
+                obj_in={"finished_at": utcnow(), "duration": duration, "error": error},
+                only_active=False,
+            )
+            await crud.job_run.prune(
+                db,
+                job.name,
+                before=datetime.utcnow()
+                - timedelta(days=settings.JOB_RUN_RETENTION_DAYS),
+            )
+            await db.commit()
+        return job_run
+
+    async def _loop(self, job: Job):
+        while True:
+            if job.leader is not None and not job.leader.is_leader:
+                await asyncio.sleep(job.leader.interval)
+                continue
+            try:
+                scheduled_for = await self._next_run(job)
+            except Exception as e:
+                logger.warning(f"job {job.name} could not be scheduled: {e!r}")
+                await asyncio.sleep(RETRY_DELAY)
+                continue
+            delay = (scheduled_for - datetime.utcnow()).total_seconds()
+            await asyncio.sleep(max(delay, 0) + random.uniform(0, job.jitter))
+            # leadership may have moved while sleeping
+            if job.leader is not None and not job.leader.is_leader:
+                continue
+            try:
+                await self.run(job, scheduled_for)
+            except Exception as e:
+                logger.warning(f"job {job.name} run could not be recorded: {e!r}")
+                await asyncio.sleep(RETRY_DELAY)
+
+    def start(self):
+        self._tasks = [asyncio.ensure_future(self._loop(j)) for j in self.jobs.values()]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+
+registry = JobRegistry()
@@ -1,11 +1,11 @@
 import pathlib
 
 from fastapi import FastAPI
-from fastapi.staticfiles import StaticFiles
 from starlette.middleware.cors import CORSMiddleware
 
 from . import cron
 from .core.config import settings
+from .jobs import registry
 
 # routes
 from .routers import (
@@ -21,7 +21,14 @@ from .routers import (
     webauthn,
     webhook,
 )
-from .utils.cron import repeat_at
+from .utils.compression import CompressionMiddleware
+from .utils.cron import repeat_every
+from .utils.http import http_clients
+from .utils.leader import scheduler
+from .utils.loop_monitor import loop_monitor
+from .utils.metrics import MetricsMiddleware
+from .utils.profiling import ProfilingMiddleware
+from .utils.static import PrecompressedStaticFiles
 
 app = FastAPI(title=settings.PROJECT_NAME, version="0.0.1", docs_url=None)
 
@@ -35,10 +42,24 @@ if settings.BACKEND_CORS_ORIGINS:
         allow_headers=["*"],
     )
 
+app.add_middleware(
+    CompressionMiddleware, minimum_size=settings.COMPRESSION_MINIMUM_SIZE
+)
+
+app.add_middleware(ProfilingMiddleware)
+# outermost - so the latency includes the other middleware
+app.add_middleware(MetricsMiddleware)
+
 module_dir = pathlib.Path(__file__).parent.absolute()
 
 
-app.mount("/static", StaticFiles(directory=module_dir / "static"), name="static")
+app.mount(
+    "/static",
+    PrecompressedStaticFiles(
+        directory=module_dir / "static", max_age=settings.STATIC_MAX_AGE
+    ),
+    name="static",
+)
 app.include_router(auth.router, prefix="/auth", tags=["auth"])
 app.include_router(webauthn.router, prefix="/webauthn", tags=["webauthn_2fa"])
 app.include_router(user.router, prefix="/users", tags=["user"])
@@ -52,8 +73,65 @@ app.include_router(webhook.router, prefix="/webhook", tags=["webhook"])
 app.include_router(misc.router, tags=["misc"])
 
 
-# release/generate slots every hour if any available
+# elect the one process of the cluster running the scheduled jobs
 @app.on_event("startup")
-@repeat_at(cron="0 * * * *", wait_first=True, raise_exceptions=True)
+async def _start_scheduler_election():
+    scheduler.start()
+
+
+# release/generate slots every hour if any available
+@registry.job(name="generate_slots", cron="0 * * * *", leader=scheduler)
 async def _generate_slots():
     await cron.generate_slots()
+
+
+# send queued emails from the outbox
+@app.on_event("startup")
+@repeat_every(seconds=settings.EMAIL_OUTBOX_INTERVAL, wait_first=True)
+async def _send_emails():
+    await cron.send_emails()
+
+
+# apply webhook events left in the inbox
+@app.on_event("startup")
+@repeat_every(seconds=settings.WEBHOOK_INBOX_INTERVAL, wait_first=True)
+async def _process_webhooks():
+    await cron.process_webhooks()
+
+
+# catch payments whose webhook never arrived
+@registry.job(
+    name="reconcile_payments", cron=settings.PAYMENT_RECONCILE_CRON, leader=scheduler
+)
+async def _reconcile_payments():
+    await cron.reconcile_payments()
+
+
+@app.on_event("startup")
+async def _start_jobs():
+    registry.start()
+
+
+@app.on_event("startup")
+async def _start_loop_monitor():
+    loop_monitor.start()
+
+
+@app.on_event("shutdown")
+async def _stop_loop_monitor():
+    loop_monitor.stop()
+
+
+@app.on_event("shutdown")
+async def _stop_jobs():
+    await registry.stop()
+
+
+@app.on_event("shutdown")
+async def _stop_scheduler_election():
+    await scheduler.stop()
+
+
+@app.on_event("shutdown")
+async def _close_http_clients():
+    await http_clients.close()
@@ -32,6 +32,8 @@ class User(TimestampableMixin, Base):
     enabled_2fa = sa.Column(sa.Boolean, nullable=False, default=False)
     door_id = sa.Column(sa.String, nullable=True, index=True)
     stripe_customer_id = sa.Column(sa.String, nullable=True)
+    # hash of name/email last synced to the stripe customer
+    stripe_customer_fingerprint = sa.Column(sa.String, nullable=True)
     member = sa.orm.relationship("Member", back_populates="user", lazy="noload")
     webauthn = sa.orm.relationship("Webauthn", back_populates="user", lazy="noload")
     slot = sa.orm.relationship("Slot", back_populates="user", lazy="noload")
@@ -62,11 +64,23 @@ class Member(TimestampableMixin, Base):
     product_id = sa.Column(sa.Integer, sa.ForeignKey("product.id"), primary_key=True)
     date_start = sa.Column(sa.Date, nullable=False)
     date_end = sa.Column(sa.Date, nullable=False)
-    active = sa.orm.column_property(date_end >= sa.func.now())
+    # active up to and including date_end - compared as a date (not with now())
+    # so the (user_id, date_end) and (product_id, date_end) indexes are used
+    active = sa.orm.column_property(date_end >= sa.func.current_date())
     user = sa.orm.relationship("User", back_populates="member", lazy="noload")
     product = sa.orm.relationship("Product", back_populates="member", lazy="noload")
     payment_id = sa.Column(sa.String, nullable=True)
 
+    __table_args__ = (
+        sa.Index("ix_member_user_id_date_end", "user_id", "date_end"),
+        sa.Index("ix_member_product_id_date_end", "product_id", "date_end"),
+    )
+
+    @classmethod
+    def active_as_of(cls, day: datetime.date) -> sa.sql.ColumnElement:
+        """the memberships active on day - Member.active is for today"""
+        return cls.date_end >= day
+
 
 class Product(TimestampableMixin, Base):
     __tablename__ = "product"
@@ -163,3 +177,69 @@ class LockTable(Base):
 
     name = sa.Column(sa.String, primary_key=True)
     ran_at = sa.Column(sa.DateTime, nullable=False, default=utcnow())
+
+
+class EmailOutbox(TimestampableMixin, Base):
+    """outbox of transactional emails waiting to be sent"""
+
+    __tablename__ = "email_outbox"
+
+    id = sa.Column(sa.Integer, sa.Identity(start=1, increment=1), primary_key=True)
+    to_email = sa.Column(sa.String, nullable=False)
+    template_id = sa.Column(sa.String, nullable=False)
+    data = sa.Column(sa_pg.JSONB, nullable=False, default=dict)
+    attempts = sa.Column(sa.Integer, nullable=False, default=0)
+    sent_at = sa.Column(sa.DateTime, nullable=True)
+    last_error = sa.Column(sa.String, nullable=True)
+
+    __table_args__ = (
+        sa.Index("ix_email_outbox_pending", "id", postgresql_where=sent_at.is_(None)),
+    )
+
+
+class WebhookInbox(TimestampableMixin, Base):
+    """verified webhook events from the payment providers waiting to be applied"""
+
+    __tablename__ = "webhook_inbox"
+
+    id = sa.Column(sa.Integer, sa.Identity(start=1, increment=1), primary_key=True)
+    provider = sa.Column(sa.String, nullable=False)
+    event_id = sa.Column(sa.String, nullable=False)
+    event_type = sa.Column(sa.String, nullable=False)
+    payload = sa.Column(sa_pg.JSONB, nullable=False)
+    processed_at = sa.Column(sa.DateTime, nullable=True)
+    error = sa.Column(sa.String, nullable=True)
+
+    __table_args__ = (
+        # providers retry deliveries - the event id is only stored once
+        sa.UniqueConstraint("provider", "event_id"),
+        sa.Index(
+            "ix_webhook_inbox_pending", "id", postgresql_where=processed_at.is_(None)
+        ),
+    )
+
+
+class ResourceVersion(Base):
+    """version counters bumped on every change of a cached resource"""
+
+    __tablename__ = "resource_version"
+
+    name = sa.Column(sa.String, primary_key=True)
+    version = sa.Column(sa.BigInteger, nullable=False, default=0)
+
+
+class JobRun(Base):
+    """one run of a scheduled job (see jobs.py)"""
+
+    __tablename__ = "job_run"
+
+    id = sa.Column(sa.Integer, sa.Identity(start=1, increment=1), primary_key=True)
+    name = sa.Column(sa.String, nullable=False)
+    # the cron time the run is for - a late or catch-up run starts after it
+    scheduled_for = sa.Column(sa.DateTime, nullable=False)
+    started_at = sa.Column(sa.DateTime, nullable=False, default=utcnow())
+    finished_at = sa.Column(sa.DateTime, nullable=True)
+    duration = sa.Column(sa.Float, nullable=True)
+    error = sa.Column(sa.String, nullable=True)
+
+    __table_args__ = (sa.Index("ix_job_run_name_started_at", "name", "started_at"),)
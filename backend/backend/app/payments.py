@@ -0,0 +1,229 @@
+import datetime
+from typing import Any, Callable, Dict, Iterable, List, Set, Tuple
+
+import sqlalchemy as sa
+from dateutil.relativedelta import relativedelta
+from loguru import logger
+
+from . import crud, models
+from .core.config import settings
+from .core.utils import MailTemplateEnum, queue_transactional_email
+from .db import AsyncSession
+from .utils import netseasy, stripe
+from .utils.models_utils import PaymentStatusEnum
+
+
+class SlotNotFound(Exception):
+    pass
+
+
+# async def payment_fail(db, payment_id, background_tasks):
+#     if slot := await crud.slot.get(
+#         db,
+#         models.Slot.payment_id == payment_id,
+#         models.Slot.reserved_until > datetime.datetime.utcnow(),
+#         models.Slot.payment_status == PaymentStatusEnum.PENDING,
+#         for_update=True,
+#     ):
+#         user = await crud.user.get(db, models.User.id == slot.user_id)
+#         product = await crud.product.get(db, models.Product.id == slot.product_id)
+#         slot = await crud.slot.update(
+#             db,
+#             models.Slot.id == slot.id,
+#             obj_in={"payment_status": PaymentStatusEnum.FAIL},
+#         )
+#         await db.commit()
+#         background_tasks.add_task(
+#             send_transactional_email,
+#             to_email=user.email,
+#             template_id=MailTemplateEnum.PAYMENT_FAILED,
+#             data={"product_name": product.name},
+#         )
+#         return True
+
+#     raise SlotNotFound()
+
+
+async def payment_succeeded(db, payment_id):
+    """
+    mark the slot as paid and extend or create the membership in a single
+    statement - the slot row stays locked until the caller commits, which
+    process_inbox does after every event and apply_paid_payments callers at
+    the end of the batch
+    """
+    now = datetime.datetime.utcnow()
+    today = datetime.date.today()
+    slot = models.Slot.__table__
+    member = models.Member.__table__
+    product = models.Product.__table__
+    user = models.User.__table__
+
+    paid = (
+        sa.update(slot)
+        .where(
+            slot.c.payment_id == payment_id,
+            slot.c.reserved_until > now,
+            slot.c.payment_status == PaymentStatusEnum.PENDING,
+            slot.c.active == True,
+        )
+        .values(payment_status=PaymentStatusEnum.PAID, reserved_until=now)
+        .returning(slot.c.user_id, slot.c.product_id, slot.c.payment_id)
+        .cte("paid")
+    )
+    # already a member of this membertype - then extend until next year
+    extended = (
+        sa.update(member)
+        .where(
+            member.c.user_id == paid.c.user_id,
+            member.c.product_id == paid.c.product_id,
+            member.c.date_end >= sa.func.current_date(),
+            product.c.id == paid.c.product_id,
+            product.c.obj_type == "member_type",
+        )
+        .values(
+            date_end=sa.func.make_date(
+                sa.extract("year", member.c.date_end).cast(sa.Integer) + 1, 1, 15
+            ),
+            payment_id=paid.c.payment_id,
+        )
+        .returning(member.c.id)
+        .cte("extended")
+    )
+    # otherwise a new member for a year or for the duration of the event
+    is_event = product.c.obj_type == "event"
+    created = (
+        sa.insert(member)
+        .from_select(
+            ["user_id", "product_id", "payment_id", "date_start", "date_end"],
+            sa.select(
+                paid.c.user_id,
+                paid.c.product_id,
+                paid.c.payment_id,
+                sa.case(
+                    (is_event, sa.cast(product.c.date_start, sa.Date)), else_=today
+                ),
+                sa.case(
+                    (is_event, sa.cast(product.c.date_end, sa.Date)),
+                    else_=today + relativedelta(years=1, nlyearday=15),
+                ),
+            )
+            .select_from(paid.join(product, product.c.id == paid.c.product_id))
+            .where(
+                product.c.obj_type.in_(["member_type", "event"]),
+                ~sa.exists(sa.select(extended.c.id)),
+            ),
+        )
+        .returning(member.c.id)
+        .cte("created")
+    )
+    query = sa.select(
+        user.c.email,
+        product.c.name,
+        product.c.price,
+        # referenced so the member ctes are part of the statement
+        sa.select(sa.func.count()).select_from(created).scalar_subquery(),
+    ).select_from(
+        paid.join(user, user.c.id == paid.c.user_id).join(
+            product, product.c.id == paid.c.product_id
+        )
+    )
+    if row := (await db.execute(query)).first():
+        logger.info(f"payment {payment_id} succeeded")
+        # send payment success email
+        await queue_transactional_email(
+            db,
+            to_email=row.email,
+            template_id=MailTemplateEnum.PAYMENT_SUCCEEDED,
+            data={"product_name": row.name, "price": row.price},
+        )
+        return True
+
+    raise SlotNotFound()
+
+
+# webhook events that means a payment went through and how to get the
+# payment_id out of the event payload
+PAYMENT_SUCCEEDED_EVENTS: Dict[Tuple[str, str], Callable[[Dict[str, Any]], str]] = {
+    ("stripe", "payment_intent.succeeded"): lambda p: p["data"]["object"]["id"],
+    ("netseasy", "payment.checkout.completed"): lambda p: p["data"]["paymentId"],
+}
+
+
+async def apply_webhook_event(db: AsyncSession, event: models.WebhookInbox):
+    if get_payment_id := PAYMENT_SUCCEEDED_EVENTS.get(
+        (event.provider, event.event_type)
+    ):
+        await payment_succeeded(db, get_payment_id(event.payload))
+
+
+async def process_inbox(db: AsyncSession) -> int:
+    """
+    apply up to a batch of pending webhook events, returns the number of
+    events processed.
+
+    every event is claimed, applied and committed on its own - so the slot
+    row is only locked while its event is applied. It is applied in a
+    savepoint and marked as processed whether it succeeded or not, so an
+    event is never applied twice (at-most-once)
+    """
+    processed = 0
+    while processed < settings.WEBHOOK_INBOX_BATCH_SIZE:
+        events = await crud.webhook_inbox.claim_pending(db, limit=1)
+        if not events:
+            break
+        event_id, error = events[0].id, None
+        try:
+            async with db.begin_nested():
+                await apply_webhook_event(db, events[0])
+        except SlotNotFound:
+            error = "slot not found"
+        except Exception as ex:
+            logger.exception(f"webhook event {event_id} failed: {ex}")
+            error = str(ex) or type(ex).__name__
+        await crud.webhook_inbox.mark_processed(db, event_id, error=error)
+        await db.commit()
+        processed += 1
+    return processed
+
+
+async def pending_payment_slots(db: AsyncSession) -> List[models.Slot]:
+    return await crud.slot.get_multi(
+        db,
+        models.Slot.payment_status == PaymentStatusEnum.PENDING,
+        models.Slot.payment_id != None,
+        models.Slot.reserved_until > datetime.datetime.utcnow(),
+    )
+
+
+async def paid_payment_ids(slots: List[models.Slot]) -> Set[str]:
+    """ask the payment providers which of the slots payments went through"""
+    stripe_ids = {s.payment_id for s in slots if s.payment_id.startswith("pi_")}
+    nets_ids = {s.payment_id for s in slots if netseasy.is_payment_id(s.payment_id)}
+    paid = set()
+    if stripe_ids:
+        # the payment intents are created after the slot - so list all the
+        # intents since the oldest slot in a few paged calls
+        created_gte = min(s.created_at for s in slots if s.payment_id in stripe_ids)
+        paid |= await stripe.succeeded_payment_intents(created_gte) & stripe_ids
+    if nets_ids:
+        paid |= await netseasy.paid_payment_ids(nets_ids)
+    return paid
+
+
+async def apply_paid_payments(db: AsyncSession, payment_ids: Iterable[str]) -> int:
+    """
+    run payment_succeeded for each payment, returns how many slots was paid -
+    the caller commits
+    """
+    applied = 0
+    for payment_id in payment_ids:
+        try:
+            async with db.begin_nested():
+                await payment_succeeded(db, payment_id)
+            applied += 1
+        except SlotNotFound:
+            # the webhook got here first
+            pass
+        except Exception as ex:
+            logger.exception(f"reconcile of payment {payment_id} failed: {ex}")
+    return applied
@@ -1,11 +1,9 @@
 from base64 import b64decode
 from typing import Any
 
-import fido2
 import sqlalchemy as sa
 from fastapi import (
     APIRouter,
-    BackgroundTasks,
     Body,
     Depends,
     HTTPException,
@@ -20,7 +18,7 @@ from loguru import logger
 from .. import crud, deps, models, schemas
 from ..core.security import (
     create_access_token,
-    fido2server,
+    fido2_server,
     generate_password_reset_token,
     generate_signup_confirm_token,
     generate_webauthn_state_token,
@@ -31,7 +29,7 @@ from ..core.security import (
     verify_webauthn_staten_token,
     webauthn_state,
 )
-from ..core.utils import MailTemplateEnum, send_transactional_email
+from ..core.utils import MailTemplateEnum, queue_transactional_email
 from ..db import AsyncSession
 
 router = APIRouter()
@@ -39,7 +37,6 @@ router = APIRouter()
 
 @router.post("/token", response_model=schemas.Token)
 async def login_access_token(
-    bgtask: BackgroundTasks,
     db: AsyncSession = Depends(deps.get_db),
     form_data: security.OAuth2PasswordRequestForm = Depends(),
 ) -> Any:
@@ -72,8 +69,8 @@ async def login_access_token(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Inactive user"
         )
     if not user.email_confirmed:
-        bgtask.add_task(
-            send_transactional_email,
+        await queue_transactional_email(
+            db,
             to_email=user.email,
             template_id=MailTemplateEnum.CONFIRM_SIGNUP,
             data={
@@ -81,6 +78,7 @@ async def login_access_token(
                 "confirm_token": generate_signup_confirm_token(user.email),
             },
         )
+        await db.commit()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="email not confirmed",
@@ -88,7 +86,11 @@ async def login_access_token(
     # if 2factor enabled then return a 2factor challenge in application/cboe format
     # user then have to finish getting the token from the 2factor endpoint
     if user.enabled_2fa:
-        auth_data, state = fido2server.authenticate_begin(
+        import fido2.cbor
+        import fido2.ctap2
+        import fido2.webauthn
+
+        auth_data, state = fido2_server().authenticate_begin(
             credentials=[
                 fido2.ctap2.AttestedCredentialData(b64decode(wac.credential))
                 for wac in user.webauthn
@@ -111,6 +113,11 @@ async def login_access_token_with_2fa(
     _state=Depends(webauthn_state),
     db: AsyncSession = Depends(deps.get_db),
 ) -> Any:
+    import fido2.cbor
+    import fido2.client
+    import fido2.ctap2
+
+    fido2server = fido2_server()
     try:
         # decode the request's body
         data = fido2.cbor.decode(await request.body())
@@ -177,7 +184,6 @@ async def login_access_token_with_2fa(
 
 @router.post("/password-recovery/{email}", response_model=schemas.Msg)
 async def recover_password(
-    background_tasks: BackgroundTasks,
     email: str = Path(..., title="the email address to recover email from"),
     db: AsyncSession = Depends(deps.get_db),
 ) -> Any:
@@ -186,12 +192,13 @@ async def recover_password(
     """
     if user := await crud.user.get(db, models.User.email == email):
         password_reset_token = generate_password_reset_token(email=email)
-        background_tasks.add_task(
-            send_transactional_email,
+        await queue_transactional_email(
+            db,
             to_email=user.email,
             template_id=MailTemplateEnum.PASSWORD_RESET,
             data={"password_reset_token": password_reset_token},
         )
+        await db.commit()
         return {"msg": "password recovery email sent"}
 
     raise HTTPException(
@@ -1,13 +1,16 @@
 import datetime
-from typing import List
+from typing import Iterable, List
 
 import sqlalchemy as sa
-from fastapi import APIRouter, Depends, HTTPException, Security, status
+from dateutil.tz import UTC
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Security, status
 from fastapi.security.api_key import APIKeyHeader
-from pydantic import BaseModel
+from loguru import logger
+from pydantic import BaseModel, conlist
 
 from .. import crud, deps, models, schemas
 from ..core.config import settings
+from ..core.security import verify_door_access_token
 from ..core.utils import tz_now
 from ..db import AsyncSession
 from ..utils.models_utils import DoorAccessEnum
@@ -22,11 +25,64 @@ class DoorAccessQuery(BaseModel):
     key: str
 
 
+class DoorAccessTokenQuery(BaseModel):
+    token: str
+
+
+class DoorAccessSwipe(BaseModel):
+    key: str
+    timestamp: datetime.datetime
+
+
+class DoorAccessVerdict(BaseModel):
+    key: str
+    timestamp: datetime.datetime
+    access: bool
+
+
+def _as_utc(timestamp: datetime.datetime) -> datetime.datetime:
+    """naive timestamps from the door controller are taken as utc"""
+    if timestamp.tzinfo is None:
+        return timestamp.replace(tzinfo=UTC)
+    return timestamp.astimezone(UTC)
+
+
+def _door_access_allowed(
+    members: Iterable[models.Member], at: datetime.datetime
+) -> bool:
+    """check if any of the memberships give door access at the given time"""
+    local = at.astimezone(settings.TZ)
+    for member in members:
+        if not isinstance(member.product, models.MemberType):
+            continue
+        if not member.date_start <= local.date() <= member.date_end:
+            continue
+        if any(
+            [
+                member.product.door_access == DoorAccessEnum.FULL,
+                member.product.door_access == DoorAccessEnum.MORNING
+                and (7 <= local.hour <= 15),
+            ]
+        ):
+            return True
+    return False
+
+
 def get_api_key(api_key: str = Security(api_key_header)):
     if api_key != settings.DOOR_API_KEY:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="go away")
 
 
+async def _store_door_event(user_id: int):
+    """best effort logging of a door event - the door is already open"""
+    try:
+        async with deps.get_db_context() as db:
+            await crud.door_event.create(db, obj_in={"user_id": user_id})
+            await db.commit()
+    except Exception as ex:
+        logger.warning(f"could not store door event for user {user_id}: {ex}")
+
+
 @router.post(
     "/door-access",
     status_code=status.HTTP_204_NO_CONTENT,
@@ -45,22 +101,77 @@ async def access_door(
             ).selectinload(models.Member.product.and_(models.Product.active == True))
         ],
     ):
-        for member in user.member:
-            if not isinstance(member.product, models.MemberType):
-                continue
-            if any(
-                [
-                    member.product.door_access == DoorAccessEnum.FULL,
-                    member.product.door_access == DoorAccessEnum.MORNING
-                    and (7 <= tz_now().hour <= 15),
-                ]
-            ):
-                await crud.door_event.create(db, obj_in={"user_id": user.id})
-                await db.commit()
-                return
+        if _door_access_allowed(user.member, tz_now()):
+            await crud.door_event.create(db, obj_in={"user_id": user.id})
+            await db.commit()
+            return
+    raise HTTPException(status_code=status.HTTP_403_FORBIDDEN)
+
+
+@router.post(
+    "/door-access/token",
+    status_code=status.HTTP_204_NO_CONTENT,
+    dependencies=[Security(get_api_key)],
+)
+async def access_door_token(q: DoorAccessTokenQuery, background_tasks: BackgroundTasks):
+    """
+    verify a signed door access token (qr code) - only the signature and the
+    validity window is checked so it works even if the database is slow or down
+    """
+    if claims := verify_door_access_token(q.token):
+        if any(
+            [
+                claims["door_access"] == DoorAccessEnum.FULL,
+                claims["door_access"] == DoorAccessEnum.MORNING
+                and (7 <= tz_now().hour <= 15),
+            ]
+        ):
+            background_tasks.add_task(_store_door_event, int(claims["sub"]))
+            return
     raise HTTPException(status_code=status.HTTP_403_FORBIDDEN)
 
 
+@router.post(
+    "/door-access/batch",
+    response_model=List[DoorAccessVerdict],
+    dependencies=[Security(get_api_key)],
+)
+async def access_door_batch(
+    swipes: conlist(DoorAccessSwipe, min_items=1, max_items=1000),
+    db: AsyncSession = Depends(deps.get_db),
+):
+    """replay buffered swipes from a door controller in one go"""
+    swipes_utc = [(swipe, _as_utc(swipe.timestamp)) for swipe in swipes]
+    oldest = min(ts for _, ts in swipes_utc).astimezone(settings.TZ).date()
+    # resolve all users and the memberships that could cover the swipes at once
+    users = await crud.user.get_multi(
+        db,
+        models.User.door_id.in_({swipe.key for swipe in swipes}),
+        options=[
+            sa.orm.selectinload(
+                models.User.member.and_(models.Member.active_as_of(oldest))
+            ).selectinload(models.Member.product.and_(models.Product.active == True))
+        ],
+    )
+    users_by_key = {user.door_id: user for user in users}
+
+    verdicts, door_events = [], []
+    for swipe, timestamp in swipes_utc:
+        user = users_by_key.get(swipe.key)
+        access = user is not None and _door_access_allowed(user.member, timestamp)
+        if access:
+            door_events.append(
+                {"user_id": user.id, "created_at": timestamp.replace(tzinfo=None)}
+            )
+        verdicts.append(
+            {"key": swipe.key, "timestamp": swipe.timestamp, "access": access}
+        )
+
+    await crud.door_event.create_multi(db, door_events)
+    await db.commit()
+    return verdicts
+
+
 @router.get("/door-data", response_model=List[datetime.datetime])
 async def public_door_data(db: AsyncSession = Depends(deps.get_db)):
     entries = await crud.door_event.get_multi(
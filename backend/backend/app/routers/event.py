@@ -2,13 +2,35 @@ import datetime
 from typing import Any, Union
 
 import sqlalchemy as sa
-from fastapi import APIRouter, Depends, HTTPException, Response, Security, status
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Request,
+    Response,
+    Security,
+    status,
+)
 
 from .. import crud, deps, models, schemas
+from ..core.config import settings
 from ..db import AsyncSession
+from ..utils.etag import ResponseCache
+from ..utils.serializer import fast_response
 
 router = APIRouter()
 
+# rendered responses keyed by the version of the events
+cache = ResponseCache()
+
+
+async def _cached(request: Request, db: AsyncSession, build) -> Response:
+    version = await crud.resource_version.current(
+        db, "event", max_age=settings.CATALOG_VERSION_TTL
+    )
+    key = (version, request.url.path, str(request.query_params))
+    return await cache.respond(request, key, build)
+
 
 @router.post(
     "",
@@ -30,31 +52,45 @@ async def create_event(
 
 @router.get("", response_model=schemas.Page[schemas.Event])
 async def event_list(
+    request: Request,
     paging: deps.Paging = Depends(deps.Paging),
+    fieldset: deps.Fieldset = Depends(deps.Fieldset),
     db: AsyncSession = Depends(deps.get_db),
 ) -> Any:
     """
     Get list of all events
     """
-    return await crud.event.get_multi_page(
-        db,
-        per_page=paging.per_page,
-        page=paging.page,
-        order_by=[models.Event.name.asc()],
-    )
+
+    async def build():
+        page = await crud.event.get_multi_page(
+            db,
+            per_page=paging.per_page,
+            page=paging.page,
+            order_by=[models.Event.name.asc()],
+        )
+        return fast_response(schemas.Page[schemas.Event], page, **fieldset.page())
+
+    return await _cached(request, db, build)
 
 
 @router.get("/{event_id}", response_model=schemas.Event)
 async def get_event(
+    request: Request,
     event_id: int,
     db: AsyncSession = Depends(deps.get_db),
 ) -> Any:
     """
     Get a event
     """
-    if event := await crud.event.get(db, models.Event.id == event_id):
-        return event
-    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="event not found")
+
+    async def build():
+        if event := await crud.event.get(db, models.Event.id == event_id):
+            return fast_response(schemas.Event, event)
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="event not found"
+        )
+
+    return await _cached(request, db, build)
 
 
 @router.patch(
@@ -185,6 +221,7 @@ async def member_list(
     event_id: int,
     paging: deps.Paging = Depends(deps.Paging),
     q: deps.Q = Depends(deps.Q),
+    fieldset: deps.Fieldset = Depends(deps.Fieldset),
     db: AsyncSession = Depends(deps.get_db),
 ) -> Any:
     """
@@ -198,17 +235,13 @@ async def member_list(
                 sa.func.lower(models.User.email).contains(q.q.lower(), autoescape=True),
             )
         )
-    return await crud.member.get_multi_page(
+    page = await crud.member.get_multi_page(
         db,
         join=[models.Member.user],
         *args,
-        options=[
-            sa.orm.selectinload(models.Member.user.and_(models.User.active == True)),
-            sa.orm.selectinload(
-                models.Member.product.and_(models.Product.active == True)
-            ),
-        ],
+        options=crud.member.load_options(fieldset.includes),
         per_page=paging.per_page,
         page=paging.page,
         order_by=[models.User.name.asc(), models.Member.id.asc()],
     )
+    return fast_response(schemas.Page[schemas.MemberUser], page, **fieldset.page())
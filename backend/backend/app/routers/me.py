@@ -1,11 +1,15 @@
 from typing import Any
 
 import sqlalchemy as sa
-from fastapi import APIRouter, Depends, Security
+from fastapi import APIRouter, Depends, HTTPException, Security, status
 from loguru import logger
 
 from .. import crud, deps, models, schemas
+from ..core.security import generate_door_access_token
+from ..core.utils import tz_today
 from ..db import AsyncSession
+from ..utils.models_utils import DoorAccessEnum
+from ..utils.serializer import fast_response
 from .user import _delete_user
 
 router = APIRouter()
@@ -30,6 +34,51 @@ async def read_user_me(
     )
 
 
+@router.get("/door-token", response_model=schemas.DoorAccessToken)
+async def door_token(
+    user_id: int = Security(deps.get_current_user_id, scopes=["basic"]),
+    db: AsyncSession = Depends(deps.get_db),
+) -> Any:
+    """
+    Get a short lived signed door access token (for a qr code), the door can
+    verify it without a database lookup.
+    """
+    members = await crud.member.get_multi(
+        db,
+        models.Member.user_id == user_id,
+        # only memberships running today in local time - Member.active uses the
+        # date of the database session which may not be local
+        models.Member.date_start <= tz_today(),
+        models.Member.date_end >= tz_today(),
+        options=[
+            sa.orm.selectinload(
+                models.Member.product.and_(models.Product.active == True)
+            )
+        ],
+    )
+    # prefer full access over morning access and then the longest membership
+    rank = {DoorAccessEnum.FULL: 2, DoorAccessEnum.MORNING: 1}
+    members = sorted(
+        [
+            m
+            for m in members
+            if isinstance(m.product, models.MemberType)
+            and m.product.door_access in rank
+        ],
+        key=lambda m: (rank[m.product.door_access], m.date_end),
+        reverse=True,
+    )
+    if not members:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="no membership with door access",
+        )
+    token, expires = generate_door_access_token(
+        user_id, members[0].product.door_access, members[0].date_end
+    )
+    return {"token": token, "expires": expires}
+
+
 @router.patch("", response_model=schemas.User)
 async def update_user_me(
     update: schemas.UserUpdateMe,
@@ -56,24 +105,21 @@ async def disable_myself(
 async def member_list(
     paging: deps.Paging = Depends(deps.Paging),
     user_id: int = Security(deps.get_current_user_id, scopes=["basic"]),
+    fieldset: deps.Fieldset = Depends(deps.Fieldset),
     db: AsyncSession = Depends(deps.get_db),
 ) -> Any:
     """
     Get list of all memberships for me
     """
-    return await crud.member.get_multi_page(
+    page = await crud.member.get_multi_page(
         db,
         models.Member.user_id == user_id,
-        options=[
-            sa.orm.selectinload(models.Member.user.and_(models.User.active == True)),
-            sa.orm.selectinload(
-                models.Member.product.and_(models.Product.active == True)
-            ),
-        ],
+        options=crud.member.load_options(fieldset.includes),
         per_page=paging.per_page,
         page=paging.page,
         order_by=[models.Member.date_start.asc()],
     )
+    return fast_response(schemas.Page[schemas.MemberUser], page, **fieldset.page())
 
 
 @router.delete("/members/{member_id}")
@@ -6,6 +6,7 @@ from fastapi import APIRouter, Depends, HTTPException, Security, status
 
 from .. import crud, deps, models, schemas
 from ..db import AsyncSession
+from ..utils.serializer import fast_response
 
 router = APIRouter()
 
@@ -74,6 +75,7 @@ async def deactivate_membership(
 async def member_list(
     paging: deps.Paging = Depends(deps.Paging),
     q: deps.Q = Depends(deps.Q),
+    fieldset: deps.Fieldset = Depends(deps.Fieldset),
     db: AsyncSession = Depends(deps.get_db),
 ) -> Any:
     """
@@ -90,17 +92,13 @@ async def member_list(
         else []
     )
 
-    return await crud.member.get_multi_page(
+    page = await crud.member.get_multi_page(
         db,
         # join=[models.Member.user],
         *args,
-        options=[
-            sa.orm.selectinload(models.Member.user.and_(models.User.active == True)),
-            sa.orm.selectinload(
-                models.Member.product.and_(models.Product.active == True)
-            ),
-        ],
+        options=crud.member.load_options(fieldset.includes),
         per_page=paging.per_page,
         page=paging.page,
         # order_by=[models.User.name.asc()],
     )
+    return fast_response(schemas.Page[schemas.MemberUser], page, **fieldset.page())
@@ -2,16 +2,38 @@ import datetime
 from typing import Any, Union
 
 import sqlalchemy as sa
-from fastapi import APIRouter, Depends, HTTPException, Response, Security, status
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Request,
+    Response,
+    Security,
+    status,
+)
 from fastapi.encoders import jsonable_encoder
 from fastapi.responses import JSONResponse
 from loguru import logger
 
 from .. import crud, deps, models, schemas
+from ..core.config import settings
 from ..db import AsyncSession
+from ..utils.etag import ResponseCache
+from ..utils.serializer import fast_response
 
 router = APIRouter()
 
+# rendered responses keyed by the version of the member types
+cache = ResponseCache()
+
+
+async def _cached(request: Request, db: AsyncSession, build) -> Response:
+    version = await crud.resource_version.current(
+        db, "member_type", max_age=settings.CATALOG_VERSION_TTL
+    )
+    key = (version, request.url.path, str(request.query_params))
+    return await cache.respond(request, key, build)
+
 
 @router.post(
     "",
@@ -33,35 +55,47 @@ async def create_member_type(
 
 @router.get("", response_model=schemas.Page[schemas.MemberType])
 async def member_type_list(
+    request: Request,
     paging: deps.Paging = Depends(deps.Paging),
+    fieldset: deps.Fieldset = Depends(deps.Fieldset),
     db: AsyncSession = Depends(deps.get_db),
 ) -> Any:
     """
     Get list of all member types
     """
-    return await crud.member_type.get_multi_page(
-        db,
-        per_page=paging.per_page,
-        page=paging.page,
-        order_by=[models.MemberType.name.asc()],
-    )
+
+    async def build():
+        page = await crud.member_type.get_multi_page(
+            db,
+            per_page=paging.per_page,
+            page=paging.page,
+            order_by=[models.MemberType.name.asc()],
+        )
+        return fast_response(schemas.Page[schemas.MemberType], page, **fieldset.page())
+
+    return await _cached(request, db, build)
 
 
 @router.get("/{member_type_id}", response_model=schemas.MemberType)
 async def get_member_type(
+    request: Request,
     member_type_id: int,
     db: AsyncSession = Depends(deps.get_db),
 ) -> Any:
     """
     Get a member type
     """
-    if member_type := await crud.member_type.get(
-        db, models.MemberType.id == member_type_id
-    ):
-        return member_type
-    raise HTTPException(
-        status_code=status.HTTP_404_NOT_FOUND, detail="membertype not found"
-    )
+
+    async def build():
+        if member_type := await crud.member_type.get(
+            db, models.MemberType.id == member_type_id
+        ):
+            return fast_response(schemas.MemberType, member_type)
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="membertype not found"
+        )
+
+    return await _cached(request, db, build)
 
 
 @router.patch(
@@ -223,6 +257,7 @@ async def member_list(
     member_type_id: int,
     paging: deps.Paging = Depends(deps.Paging),
     q: deps.Q = Depends(deps.Q),
+    fieldset: deps.Fieldset = Depends(deps.Fieldset),
     db: AsyncSession = Depends(deps.get_db),
 ) -> Any:
     """
@@ -236,17 +271,13 @@ async def member_list(
                 sa.func.lower(models.User.email).contains(q.q.lower(), autoescape=True),
             )
         )
-    return await crud.member.get_multi_page(
+    page = await crud.member.get_multi_page(
         db,
         join=[models.Member.user],
         *args,
-        options=[
-            sa.orm.selectinload(models.Member.user.and_(models.User.active == True)),
-            sa.orm.selectinload(
-                models.Member.product.and_(models.Product.active == True)
-            ),
-        ],
+        options=crud.member.load_options(fieldset.includes),
         per_page=paging.per_page,
         page=paging.page,
         order_by=[models.Member.id.asc()],
     )
+    return fast_response(schemas.Page[schemas.MemberUser], page, **fieldset.page())
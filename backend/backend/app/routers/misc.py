@@ -1,30 +1,50 @@
-from typing import Any, Dict, List
+import datetime
+from functools import partial
+from typing import Any, Dict, List, Optional
 
 import aiohttp
 from dateutil.relativedelta import MO, SU, relativedelta
 from dateutil.rrule import DAILY, rrule
-from fastapi import APIRouter, Depends, status
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Query,
+    Response,
+    Security,
+    status,
+)
+from fastapi.responses import PlainTextResponse
 
-from .. import deps
+from .. import crud, deps, models, schemas
+from ..core.config import settings
+from ..utils.cache import SWRCache
 from ..utils.custom_swagger import get_swagger_ui_html
-from ..core.utils import tz_today
+from ..utils import metrics, profiling
+from ..utils.http import http_clients
+from ..core.utils import outbox_stats, tz_today
+from ..db import AsyncSession
 
 router = APIRouter()
 
 URL = "https://kulturn.kk.dk/opening_hours/instances?from_date={date_from:%Y-%m-%d}&to_date={date_to:%Y-%m-%d}&nid=1706"
 
 
-@router.get("/opening-hours", response_model=List[Dict[str, Any]])
-async def opening_hours(
-    session: aiohttp.ClientSession = Depends(deps.get_http_session),
-):
-    """try to get opening hours for today+7days from kk.dk api"""
+opening_hours_cache = SWRCache(
+    ttl=settings.OPENING_HOURS_CACHE_TTL,
+    max_stale=settings.OPENING_HOURS_CACHE_MAX_STALE,
+)
+
+
+async def _fetch_opening_hours(
+    session: aiohttp.ClientSession, date_from: datetime.date
+) -> List[Dict[str, Any]]:
     # date_from = datetime.date.today() + relativedelta(weekday=MO(-1))
     # date_to = datetime.date.today() + relativedelta(weekday=SU)
-    date_from = tz_today()
     date_to = date_from + relativedelta(days=7)
     url = URL.format(date_from=date_from, date_to=date_to)
     async with session.get(url) as resp:
+        resp.raise_for_status()
         data = await resp.json()
         d = {i["date"]: i for i in data}
         res = []
@@ -41,6 +61,25 @@ async def opening_hours(
         return res
 
 
+@router.get("/opening-hours", response_model=List[Dict[str, Any]])
+async def opening_hours(
+    response: Response,
+    session: aiohttp.ClientSession = Depends(deps.get_http_session),
+):
+    """try to get opening hours for today+7days from kk.dk api"""
+    response.headers["Cache-Control"] = (
+        f"public, max-age={settings.OPENING_HOURS_CACHE_TTL}, "
+        f"stale-while-revalidate={settings.OPENING_HOURS_CACHE_MAX_STALE}, "
+        f"stale-if-error={settings.OPENING_HOURS_CACHE_MAX_STALE}"
+    )
+    # keyed by the day - a window fetched yesterday is never served today
+    today = tz_today()
+    opening_hours_cache.discard(("opening_hours", today - relativedelta(days=1)))
+    return await opening_hours_cache.get(
+        ("opening_hours", today), partial(_fetch_opening_hours, session, today)
+    )
+
+
 @router.get("/docs", include_in_schema=False)
 async def custom_swagger_ui_html():
     """custom swagger to show which scopes are required for each endpoint"""
@@ -59,3 +98,90 @@ async def custom_swagger_ui_html():
 )
 async def healthz():
     return {"if too weak": "dont blame the routesetter"}
+
+
+@router.get(
+    "/metrics",
+    include_in_schema=False,
+    dependencies=[Depends(deps.metrics_auth)],
+)
+async def prometheus_metrics():
+    """request, database, http client and outbox metrics of all the workers"""
+    content, media_type = metrics.render()
+    return Response(content=content, headers={"Content-Type": media_type})
+
+
+@router.get(
+    "/profiles",
+    response_model=List[str],
+    dependencies=[Security(deps.get_current_user_id, scopes=["admin"])],
+)
+async def profile_list():
+    """stored request profiles, newest first"""
+    return profiling.list_profiles()
+
+
+@router.get(
+    "/profiles/{name}",
+    response_class=PlainTextResponse,
+    dependencies=[Security(deps.get_current_user_id, scopes=["admin"])],
+)
+async def get_profile(name: str):
+    """a request profile as folded stacks - for flamegraph.pl or speedscope"""
+    if report := profiling.read_profile(name):
+        return report
+    raise HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND, detail="profile not found"
+    )
+
+
+@router.get(
+    "/http-clients",
+    response_model=Dict[str, Dict[str, Any]],
+    dependencies=[Security(deps.get_current_user_id, scopes=["admin"])],
+)
+async def http_client_stats():
+    """pool metrics of the shared outbound http clients"""
+    return http_clients.stats()
+
+
+@router.get(
+    "/email-outbox",
+    response_model=Dict[str, Any],
+    dependencies=[Security(deps.get_current_user_id, scopes=["admin"])],
+)
+async def email_outbox_stats(db: AsyncSession = Depends(deps.get_db)):
+    """backlog and throughput of the email outbox worker"""
+    sent = outbox_stats["sent"]
+    return {
+        "pending": await crud.email_outbox.count_pending(
+            db, max_attempts=settings.EMAIL_OUTBOX_MAX_ATTEMPTS
+        ),
+        "emails_per_request": sent / outbox_stats["requests"]
+        if outbox_stats["requests"]
+        else None,
+        "emails_per_second": sent / outbox_stats["send_seconds"]
+        if outbox_stats["send_seconds"]
+        else None,
+        **outbox_stats,
+    }
+
+
+@router.get(
+    "/job-runs",
+    response_model=List[schemas.JobRun],
+    dependencies=[Security(deps.get_current_user_id, scopes=["admin"])],
+)
+async def job_runs(
+    name: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(deps.get_db),
+):
+    """recent runs of the scheduled jobs, newest first"""
+    return await crud.job_run.get_multi(
+        db,
+        *([models.JobRun.name == name] if name else []),
+        order_by=[models.JobRun.started_at.desc(), models.JobRun.id.desc()],
+        only_active=False,
+        limit=limit,
+    )
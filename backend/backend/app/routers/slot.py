@@ -30,6 +30,15 @@ async def create_nets_easy_payment_id(
         ],
         for_update=True,
     ):
+        # reuse the payment already created for this slot (eg. on page refresh)
+        if netseasy.is_payment_id(slot.payment_id):
+            if slot.payment_status == PaymentStatusEnum.PENDING:
+                return {"payment_id": slot.payment_id}
+            elif slot.payment_status == PaymentStatusEnum.PAID:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="you have already paid this",
+                )
         payment_id = await netseasy.create_payment_id(
             order_id=slot.id, product=slot.product, user=user
         )
@@ -63,33 +72,33 @@ async def slot_create_payment_intent(
         ],
         for_update=True,
     ):
-        # ensure customer is created in stripe and update if already
-        if not user.stripe_customer_id:
-            stripe_customer_id = stripe.create_customer(
-                email=user.email, name=user.name, metadata={"user_id": user.id}
+        if slot.payment_status == PaymentStatusEnum.PAID:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="you have already paid this",
             )
+        # if a payment intent is already created for this slot - then reuse it
+        # else continue if FAILED and allow create a new one and retry
+        if slot.payment_status == PaymentStatusEnum.PENDING and (
+            slot.payment_id or ""
+        ).startswith("pi_"):
+            payment_intent = await stripe.retrieve_payment_intent(slot.payment_id)
+            if payment_intent.status in stripe.REUSABLE_INTENT_STATUSES:
+                return {"client_secret": payment_intent.client_secret}
+            # the intent may be paid - replacing it would lose its webhook
+            if payment_intent.status != "canceled":
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="payment in progress",
+                )
+        # ensure customer is created in stripe and only update it if changed
+        if changes := await stripe.sync_customer(user):
             user = await crud.user.update(
                 db,
                 models.User.id == user.id,
-                obj_in={"stripe_customer_id": stripe_customer_id},
+                obj_in=changes,
             )
-        else:
-            stripe.update_customer(
-                stripe_customer_id=user.stripe_customer_id,
-                email=user.email,
-                name=user.name,
-            )
-        # if a payment intent is already created for this slot - then return it
-        if slot.payment_id:
-            if slot.payment_status == PaymentStatusEnum.PENDING:
-                return {"payment_intent_id": slot.stripe_id}
-            elif slot.payment_status == PaymentStatusEnum.PAID:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="you have already paid this",
-                )
-            # else continue if FAILED and allow create a new one and retry
-        payment_intent = stripe.create_payment_intent(
+        payment_intent = await stripe.create_payment_intent(
             stripe_customer_id=user.stripe_customer_id,
             amount=slot.product.price,
             statement_descriptor_suffix=f"{slot.product.name_short}",  # put the product name on the credit card statement as suffix
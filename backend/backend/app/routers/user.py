@@ -1,24 +1,24 @@
-import io
-from os import stat
 from typing import Any, List
 
 import sqlalchemy as sa
 from fastapi import (
     APIRouter,
-    BackgroundTasks,
     Depends,
     HTTPException,
+    Request,
     Response,
     Security,
     status,
 )
 from loguru import logger
-import squares
 
 from .. import crud, deps, models, schemas
+from ..core.config import settings
 from ..core.security import generate_signup_confirm_token, get_password_hash
-from ..core.utils import MailTemplateEnum, send_transactional_email
+from ..core.utils import MailTemplateEnum, queue_transactional_email
 from ..db import AsyncSession
+from ..identicon import identicon_etag, identicons
+from ..utils.serializer import fast_response
 
 router = APIRouter()
 
@@ -45,6 +45,7 @@ async def _delete_user(db: AsyncSession, user_id: int):
 async def user_list(
     paging: deps.Paging = Depends(deps.Paging),
     q: deps.Q = Depends(deps.Q),
+    fieldset: deps.Fieldset = Depends(deps.Fieldset),
     db: AsyncSession = Depends(deps.get_db),
 ) -> Any:
     """
@@ -62,18 +63,15 @@ async def user_list(
         else []
     )
 
-    return await crud.user.get_multi_page(
+    page = await crud.user.get_multi_page(
         db,
-        options=[
-            sa.orm.selectinload(
-                models.User.member.and_(models.Member.active == True)
-            ).selectinload(models.Member.product.and_(models.Product.active == True))
-        ],
+        options=crud.user.load_options(fieldset.includes),
         *args,
         page=paging.page,
         per_page=paging.per_page,
         order_by=[models.User.name.asc(), models.User.id.asc()],
     )
+    return fast_response(schemas.Page[schemas.User], page, **fieldset.page())
 
 
 @router.get(
@@ -127,17 +125,15 @@ async def create_user(
 )
 async def signup_user(
     create: schemas.UserCreate,
-    bgtask: BackgroundTasks,
     db: AsyncSession = Depends(deps.get_db),
 ) -> Any:
     obj_in = create.dict(exclude_unset=True)
     password = obj_in.pop("password")
     obj_in["hashed_password"] = get_password_hash(password)
     user = await crud.user.create(db, obj_in=obj_in)
-    await db.commit()
     # send email to confirm the email
-    bgtask.add_task(
-        send_transactional_email,
+    await queue_transactional_email(
+        db,
         to_email=user.email,
         template_id=MailTemplateEnum.CONFIRM_SIGNUP,
         data={
@@ -145,6 +141,7 @@ async def signup_user(
             "confirm_token": generate_signup_confirm_token(user.email),
         },
     )
+    await db.commit()
     return user
 
 
@@ -186,18 +183,31 @@ async def delete_user(
 
 @router.get("/{user_id}/identicon.png", responses={200: {"content": {"image/png": {}}}})
 async def read_user_by_id_identicon(
+    request: Request,
     user_id: int,
     db: AsyncSession = Depends(deps.get_db),
 ) -> Any:
     """
     Get a identicon for a specific user by id.
     """
-    user = await crud.user.get(db, models.User.id == user_id)
-
-    img = squares.generate(user.email)
-    img = img.quantize(method=2)
+    email = (
+        await db.execute(
+            sa.select(models.User.email).where(
+                models.User.id == user_id, models.User.active == True
+            )
+        )
+    ).scalar()
+    if not email:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="user not found"
+        )
 
-    with io.BytesIO() as bi:
-        img.save(bi, "png")
-        bi.seek(0)
-        return Response(content=bi.getvalue(), media_type="image/png")
+    headers = {
+        "ETag": f'"{identicon_etag(email)}"',
+        "Cache-Control": f"public, max-age={settings.IDENTICON_MAX_AGE}",
+    }
+    if headers["ETag"] in request.headers.get("if-none-match", ""):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(
+        content=await identicons.get(email), media_type="image/png", headers=headers
+    )
@@ -1,7 +1,6 @@
 import base64
 from typing import Any
 
-import fido2
 import sqlalchemy as sa
 from fastapi import (
     APIRouter,
@@ -16,16 +15,15 @@ from fastapi import (
 )
 
 from .. import crud, deps, models, schemas
-from ..core.config import settings
-from ..core.security import generate_webauthn_state_token, verify_webauthn_staten_token
+from ..core.security import (
+    fido2_server,
+    generate_webauthn_state_token,
+    verify_webauthn_staten_token,
+)
 from ..db import AsyncSession
 
-rp = fido2.webauthn.PublicKeyCredentialRpEntity(
-    settings.WEBAUTHN_RP_ID, settings.WEBAUTHN_RP_NAME
-)
-fido2server = fido2.server.Fido2Server(rp)
 webauthn_state = security.APIKeyCookie(name="_state", auto_error=True)
-USER_VERIFICATION = fido2.webauthn.UserVerificationRequirement.DISCOURAGED
+USER_VERIFICATION = "discouraged"
 
 router = APIRouter()
 
@@ -36,6 +34,8 @@ async def webauthn_add_begin(
     db: AsyncSession = Depends(deps.get_db),
     user_id: models.User = Security(deps.get_current_user_id, scopes=["basic"]),
 ) -> Any:
+    import fido2.cbor
+    import fido2.ctap2
 
     user = await crud.user.get(
         db,
@@ -48,7 +48,7 @@ async def webauthn_add_begin(
     )
 
     # calls the library which provides the credential options and a state
-    registration_data, state = fido2server.register_begin(
+    registration_data, state = fido2_server().register_begin(
         {
             # id is a byte sequence as described in
             # https://w3c.github.io/webauthn/#dom-publickeycredentialuserentity-id
@@ -95,6 +95,11 @@ async def complete_webauthn(
     _state=Depends(webauthn_state),
     name: str = Query(...),
 ):
+    import fido2.cbor
+    import fido2.client
+    import fido2.ctap2
+
+    fido2server = fido2_server()
     try:
         # decode the requests body using cbor
         data = fido2.cbor.decode(await request.body())
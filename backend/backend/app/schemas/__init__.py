@@ -15,7 +15,8 @@ from .slot import Slot, SlotCreate, SlotInDB, SlotUpdate
 from .waiting_list import WaitingList, WaitingListCreate, WaitingListUpdate
 from .msg import Msg
 from .page import Page
-from .token import Token, TokenPayload
+from .token import DoorAccessToken, Token, TokenPayload
 from .user import User, UserCreate, UserInDB, UserUpdate, UserUpdateMe
 from .webauthn import Webauthn, WebauthnCreate, WebauthnUpdate
 from .netseasy import WebhookEvent
+from .job_run import JobRun
@@ -1,3 +1,4 @@
+from datetime import datetime
 from typing import List
 
 from pydantic import BaseModel
@@ -11,3 +12,8 @@ class Token(BaseModel):
 class TokenPayload(BaseModel):
     sub: str
     scopes: List[str] = []
+
+
+class DoorAccessToken(BaseModel):
+    token: str
+    expires: datetime
@@ -0,0 +1,71 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+from loguru import logger
+
+
+class SWRCache:
+    """
+    Small in-process stale-while-revalidate cache.
+
+    * younger than `ttl`: served from the cache
+    * younger than `ttl + max_stale`: served from the cache at once and
+      refreshed in the background
+    * older or missing: fetched, concurrent misses share one fetch
+
+    If a fetch fails the last good value is served as long as there is one.
+    """
+
+    def __init__(self, ttl: float, max_stale: float = 0):
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self._entries: Dict[Hashable, Tuple[float, Any]] = {}
+        self._fetching: Dict[Hashable, asyncio.Task] = {}
+
+    def _fetch(
+        self, key: Hashable, fetch: Callable[[], Awaitable[Any]]
+    ) -> asyncio.Task:
+        task = self._fetching.get(key)
+        # tasks are bound to their loop - only share fetches within the same loop
+        if task and not task.done() and task.get_loop() is asyncio.get_running_loop():
+            return task
+
+        async def _run():
+            value = await fetch()
+            self._entries[key] = (time.monotonic(), value)
+            return value
+
+        def _done(task: asyncio.Task):
+            if self._fetching.get(key) is task:
+                del self._fetching[key]
+            if not task.cancelled() and task.exception():
+                logger.warning(f"cache refresh of {key} failed: {task.exception()}")
+
+        task = asyncio.ensure_future(_run())
+        task.add_done_callback(_done)
+        self._fetching[key] = task
+        return task
+
+    async def get(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        entry = self._entries.get(key)
+        if entry:
+            age = time.monotonic() - entry[0]
+            if age < self.ttl:
+                return entry[1]
+            if age < self.ttl + self.max_stale:
+                self._fetch(key, fetch)
+                return entry[1]
+        try:
+            # shield so a cancelled request doesn't cancel the shared fetch
+            return await asyncio.shield(self._fetch(key, fetch))
+        except Exception:
+            if entry:
+                return entry[1]
+            raise
+
+    def discard(self, key: Hashable):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
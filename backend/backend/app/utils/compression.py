@@ -0,0 +1,164 @@
+import zlib
+from typing import Iterable, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    # brotlipy comes with aiohttp[speedups] - the google Brotli package works too
+    import brotli
+except ImportError:  # pragma: no cover - gzip only then
+    brotli = None
+
+# already compressed or binary formats where compressing is wasted cpu
+EXCLUDED_MEDIA_TYPES = (
+    "image/",
+    "audio/",
+    "video/",
+    "application/cbor",
+    "application/zip",
+    "application/gzip",
+    "application/octet-stream",
+)
+
+
+def supported_encodings() -> Tuple[str, ...]:
+    return ("br", "gzip") if brotli else ("gzip",)
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """the best encoding we support that the client accepts"""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding.strip().lower()] = q
+    for encoding in supported_encodings():
+        if accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return None
+
+
+class Encoder:
+    """streaming gzip or brotli compression of a response body"""
+
+    def __init__(self, encoding: str, level: Optional[int] = None):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=4 if level is None else level)
+            # brotlipy calls it compress - Brotli calls it process
+            if hasattr(self._brotli, "process"):
+                self._process = self._brotli.process
+            else:
+                self._process = self._brotli.compress
+        else:
+            self._zlib = zlib.compressobj(
+                6 if level is None else level, zlib.DEFLATED, 16 + zlib.MAX_WBITS
+            )
+
+    def compress(self, data: bytes, finish: bool = False) -> bytes:
+        if self.encoding == "br":
+            out = self._process(data)
+            return out + (self._brotli.finish() if finish else self._brotli.flush())
+        out = self._zlib.compress(data)
+        return out + self._zlib.flush(zlib.Z_FINISH if finish else zlib.Z_SYNC_FLUSH)
+
+
+def compress(data: bytes, encoding: str, level: Optional[int] = None) -> bytes:
+    return Encoder(encoding, level).compress(data, finish=True)
+
+
+def weak_etag(headers: MutableHeaders):
+    # the compressed body is another representation of the same resource - weak
+    # also when not compressed so a 304 and a 200 carry the same etag
+    etag = headers.get("etag")
+    if etag and not etag.startswith("W/"):
+        headers["etag"] = f"W/{etag}"
+
+
+class CompressionMiddleware:
+    """
+    Like starlette's GZipMiddleware - but negotiates brotli or gzip and
+    leaves small, binary and already encoded responses alone.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        exclude_media_types: Iterable[str] = EXCLUDED_MEDIA_TYPES,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.exclude_media_types = tuple(exclude_media_types)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            headers = Headers(scope=scope)
+            if encoding := negotiate(headers.get("accept-encoding", "")):
+                responder = _CompressionResponder(self, encoding, send)
+                await self.app(scope, receive, responder.send)
+                return
+        await self.app(scope, receive, send)
+
+
+class _CompressionResponder:
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send: Send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self._send = send
+        self.start: Message = {}
+        self.encoder: Optional[Encoder] = None
+        self.started = False
+
+    def _compressible(self, headers: MutableHeaders) -> bool:
+        if "content-encoding" in headers:
+            return False
+        content_type = headers.get("content-type", "")
+        return not content_type.startswith(self.middleware.exclude_media_types)
+
+    async def send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            # hold back the headers until we know if the body gets compressed
+            self.start = message
+            return
+        if message["type"] != "http.response.body":
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if not self.started:
+            self.started = True
+            headers = MutableHeaders(raw=self.start["headers"])
+            if not self._compressible(headers):
+                await self._send(self.start)
+                await self._send(message)
+                return
+            headers.add_vary_header("Accept-Encoding")
+            weak_etag(headers)
+            if not more_body and len(body) < self.middleware.minimum_size:
+                await self._send(self.start)
+                await self._send(message)
+                return
+
+            self.encoder = Encoder(self.encoding)
+            headers["Content-Encoding"] = self.encoding
+            message["body"] = self.encoder.compress(body, finish=not more_body)
+            if more_body:
+                del headers["Content-Length"]
+            else:
+                headers["Content-Length"] = str(len(message["body"]))
+            await self._send(self.start)
+            await self._send(message)
+        elif self.encoder:
+            message["body"] = self.encoder.compress(body, finish=not more_body)
+            await self._send(message)
+        else:
+            await self._send(message)
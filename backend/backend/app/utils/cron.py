@@ -9,6 +9,8 @@ from typing import Any, Callable, Coroutine, Optional, Union
 from croniter import croniter
 from starlette.concurrency import run_in_threadpool
 
+from .metrics import track_queries
+
 NoArgsNoReturnFuncT = Callable[[], None]
 NoArgsNoReturnAsyncFuncT = Callable[[], Coroutine[Any, Any, None]]
 NoArgsNoReturnDecorator = Callable[
@@ -100,10 +102,11 @@ def repeat_at(
                     await asyncio.sleep(seconds_to_next)
                 while max_repetitions is None or repetitions < max_repetitions:
                     try:
-                        if is_coroutine:
-                            await func()  # type: ignore
-                        else:
-                            await run_in_threadpool(func)
+                        with track_queries(func.__name__):
+                            if is_coroutine:
+                                await func()  # type: ignore
+                            else:
+                                await run_in_threadpool(func)
                         repetitions += 1
                     except Exception as exc:
                         if logger is not None:
@@ -180,10 +183,11 @@ def repeat_every(
                     await asyncio.sleep(seconds_to_next)
                 while max_repetitions is None or repetitions < max_repetitions:
                     try:
-                        if is_coroutine:
-                            await func()  # type: ignore
-                        else:
-                            await run_in_threadpool(func)
+                        with track_queries(func.__name__):
+                            if is_coroutine:
+                                await func()  # type: ignore
+                            else:
+                                await run_in_threadpool(func)
                         repetitions += 1
                     except Exception as exc:
                         if logger is not None:
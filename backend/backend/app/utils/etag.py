@@ -0,0 +1,60 @@
+import hashlib
+from collections import OrderedDict
+from typing import Awaitable, Callable, Hashable, Optional, Set, Tuple
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+
+def _etags(if_none_match: Optional[str]) -> Set[str]:
+    if not if_none_match:
+        return set()
+    tags = {tag.strip() for tag in if_none_match.split(",")}
+    # weak and strong validators compare the same for a GET
+    return {tag[2:] if tag.startswith("W/") else tag for tag in tags}
+
+
+class ResponseCache:
+    """
+    In-process cache of rendered GET responses with an ETag.
+
+    Put the resource version in the key - a change of the resource makes a new
+    key and the old entries fall out of the lru.
+    """
+
+    def __init__(self, maxsize: int = 256, cache_control: str = "no-cache"):
+        self.maxsize = maxsize
+        self.cache_control = cache_control
+        self._responses: "OrderedDict[Hashable, Tuple[bytes, str, str]]" = OrderedDict()
+
+    async def respond(
+        self,
+        request: Request,
+        key: Hashable,
+        build: Callable[[], Awaitable[Response]],
+    ) -> Response:
+        """
+        the cached response for key (built on a miss) - or a 304 if the client
+        already has it
+        """
+        if cached := self._responses.get(key):
+            self._responses.move_to_end(key)
+        else:
+            response = await build()
+            if response.status_code != 200:
+                return response
+            etag = f'"{hashlib.sha256(response.body).hexdigest()[:32]}"'
+            cached = (response.body, etag, response.media_type)
+            self._responses[key] = cached
+            while len(self._responses) > self.maxsize:
+                self._responses.popitem(last=False)
+
+        body, etag, media_type = cached
+        headers = {"ETag": etag, "Cache-Control": self.cache_control}
+        inm = _etags(request.headers.get("if-none-match"))
+        if etag in inm or "*" in inm:
+            return Response(status_code=304, headers=headers)
+        return Response(body, media_type=media_type, headers=headers)
+
+    def clear(self):
+        self._responses.clear()
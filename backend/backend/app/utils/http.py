@@ -0,0 +1,124 @@
+import asyncio
+from collections import Counter
+from typing import Any, Dict, Optional, Tuple
+
+import aiohttp
+
+from ..core.config import settings
+from .metrics import HTTP_CLIENT_EVENTS
+
+
+def _discard(loop: asyncio.AbstractEventLoop, session: aiohttp.ClientSession):
+    """close a session of another loop - on that loop if it still runs"""
+    if session.closed:
+        return
+    if loop.is_running():
+        asyncio.run_coroutine_threadsafe(session.close(), loop)
+    else:
+        # nothing runs on the loop anymore - drop the connections right away
+        session.connector._close()
+
+
+class HttpClients:
+    """
+    Registry of shared aiohttp sessions - one pooled session per outbound
+    integration (kk.dk, nets easy, ...) living for the lifetime of the app.
+
+    Sessions are created on first use and closed on app shutdown.
+    """
+
+    def __init__(self):
+        self._sessions: Dict[
+            str, Tuple[asyncio.AbstractEventLoop, aiohttp.ClientSession]
+        ] = {}
+        self._stats: Dict[str, Counter] = {}
+
+    def _trace_config(self, name: str) -> aiohttp.TraceConfig:
+        stats = self._stats.setdefault(name, Counter())
+
+        def count(key):
+            events = HTTP_CLIENT_EVENTS.labels(name, key)
+
+            async def _count(session, ctx, params):
+                stats[key] += 1
+                events.inc()
+
+            return _count
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_start.append(count("requests"))
+        trace_config.on_request_end.append(count("responses"))
+        trace_config.on_request_exception.append(count("errors"))
+        trace_config.on_connection_create_end.append(count("connections_created"))
+        trace_config.on_connection_reuseconn.append(count("connections_reused"))
+        trace_config.on_connection_queued_start.append(count("connections_queued"))
+        trace_config.on_dns_cache_hit.append(count("dns_cache_hits"))
+        trace_config.on_dns_cache_miss.append(count("dns_cache_misses"))
+        return trace_config
+
+    def _create(self, name: str, **kwargs: Any) -> aiohttp.ClientSession:
+        connector = aiohttp.TCPConnector(
+            limit=settings.HTTP_CLIENT_LIMIT,
+            limit_per_host=settings.HTTP_CLIENT_LIMIT_PER_HOST,
+            keepalive_timeout=settings.HTTP_CLIENT_KEEPALIVE,
+            use_dns_cache=True,
+            ttl_dns_cache=settings.HTTP_CLIENT_DNS_TTL,
+            resolver=aiohttp.AsyncResolver(),
+        )
+        kwargs.setdefault(
+            "timeout",
+            aiohttp.ClientTimeout(
+                total=settings.HTTP_CLIENT_TIMEOUT,
+                connect=settings.HTTP_CLIENT_CONNECT_TIMEOUT,
+            ),
+        )
+        return aiohttp.ClientSession(
+            connector=connector,
+            trace_configs=[self._trace_config(name)],
+            **kwargs,
+        )
+
+    def get(self, name: str = "default", **kwargs: Any) -> aiohttp.ClientSession:
+        """
+        get the shared session for an integration, extra kwargs (base_url,
+        headers, timeout, ...) is only used when the session is created
+        """
+        loop = asyncio.get_running_loop()
+        if name in self._sessions:
+            session_loop, session = self._sessions[name]
+            # a session is bound to the loop it was created in
+            if session_loop is loop and not session.closed:
+                return session
+            if session_loop is not loop:
+                _discard(session_loop, session)
+        session = self._create(name, **kwargs)
+        self._sessions[name] = (loop, session)
+        return session
+
+    async def close(self):
+        sessions, self._sessions = self._sessions, {}
+        loop = asyncio.get_running_loop()
+        for session_loop, session in sessions.values():
+            if session_loop is loop:
+                await session.close()
+            else:
+                _discard(session_loop, session)
+
+    def stats(self) -> Dict[str, Dict[str, Optional[int]]]:
+        """pool metrics per integration"""
+        result = {}
+        for name, counter in self._stats.items():
+            session = self._sessions.get(name, (None, None))[1]
+            connector = session.connector if session and not session.closed else None
+            result[name] = {
+                "limit": connector.limit if connector else None,
+                "limit_per_host": connector.limit_per_host if connector else None,
+                "in_flight": counter["requests"]
+                - counter["responses"]
+                - counter["errors"],
+                **counter,
+            }
+        return result
+
+
+http_clients = HttpClients()
@@ -0,0 +1,140 @@
+import asyncio
+import os
+import zlib
+from typing import Optional
+
+import sqlalchemy as sa
+from loguru import logger
+from prometheus_client import Gauge
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from ..core.config import settings
+from ..db.base import engine
+
+# one sample per live worker (pid label) - 1 in the process running the jobs
+LEADER = Gauge(
+    "scheduler_leader",
+    "Is this process the leader running the scheduled jobs",
+    ["name"],
+    multiprocess_mode="liveall",
+)
+
+
+async def _discard(conn: AsyncConnection):
+    try:
+        await conn.invalidate()
+    finally:
+        await conn.close()
+
+
+class LeaderElection:
+    """
+    Elects a single process of the cluster (all gunicorn workers on all
+    nodes) with a session level postgres advisory lock. Every process tries
+    to take the lock every interval seconds - the one holding it is leader
+    and checks its connection with a heartbeat.
+
+    A leader that dies closes its connection and the lock is released right
+    away. A leader that can not reach the database steps down when a
+    heartbeat takes longer than timeout, and the server drops its session
+    (and the lock) when the tcp keepalives go unanswered - so another
+    process takes over within about timeout + 2 * interval seconds.
+    """
+
+    def __init__(self, engine: AsyncEngine, name: str, interval: float, timeout: float):
+        self.engine = engine
+        self.name = name
+        self.key = zlib.crc32(name.encode())
+        self.interval = interval
+        self.timeout = timeout
+        self.is_leader = False
+        self._conn: Optional[AsyncConnection] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def _campaign(self):
+        conn = await asyncio.wait_for(self.engine.connect(), self.timeout)
+        try:
+            # autocommit - an open transaction would hold back vacuum for good
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            result = await asyncio.wait_for(
+                conn.execute(sa.select(sa.func.pg_try_advisory_lock(self.key))),
+                self.timeout,
+            )
+            if not result.scalar():
+                await conn.close()
+                return
+            self._conn = conn
+            # let the server notice a vanished leader and drop its lock
+            keepalive = max(int(self.interval), 1)
+            count = max(int(self.timeout // keepalive), 1)
+            await conn.exec_driver_sql(f"SET tcp_keepalives_idle = {keepalive}")
+            await conn.exec_driver_sql(f"SET tcp_keepalives_interval = {keepalive}")
+            await conn.exec_driver_sql(f"SET tcp_keepalives_count = {count}")
+        except BaseException:
+            if self._conn is None:
+                await _discard(conn)
+            raise
+        self.is_leader = True
+        LEADER.labels(self.name).set(1)
+        logger.info(f"process {os.getpid()} is now the {self.name} leader")
+
+    async def _heartbeat(self):
+        await asyncio.wait_for(self._conn.exec_driver_sql("SELECT 1"), self.timeout)
+
+    async def _step_down(self, release: bool = False):
+        conn, self._conn = self._conn, None
+        if self.is_leader:
+            logger.warning(f"process {os.getpid()} is no longer the {self.name} leader")
+        self.is_leader = False
+        LEADER.labels(self.name).set(0)
+        if conn is None:
+            return
+        try:
+            if release:
+                await asyncio.wait_for(
+                    conn.execute(sa.select(sa.func.pg_advisory_unlock(self.key))),
+                    self.timeout,
+                )
+        finally:
+            # never hand a connection holding the lock back to the pool
+            await _discard(conn)
+
+    async def _run(self):
+        while True:
+            try:
+                if self._conn is None:
+                    await self._campaign()
+                else:
+                    await self._heartbeat()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"{self.name} leader election failed: {e!r}")
+                await self._step_down()
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        LEADER.labels(self.name).set(0)
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self._step_down(release=True)
+        except Exception as e:
+            logger.warning(f"{self.name} leader could not release the lock: {e!r}")
+
+
+# runs the jobs of the registry - see jobs.py and main.py
+scheduler = LeaderElection(
+    engine,
+    "monkeybase-scheduler",
+    interval=settings.LEADER_HEARTBEAT_INTERVAL,
+    timeout=settings.LEADER_TIMEOUT,
+)
@@ -0,0 +1,115 @@
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+from loguru import logger
+from prometheus_client import Counter, Histogram
+
+from ..core.config import settings
+
+EVENT_LOOP_LAG = Histogram(
+    "event_loop_lag_seconds",
+    "How late the event loop runs a scheduled callback",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+EVENT_LOOP_STALLS = Counter(
+    "event_loop_stalls", "Times the event loop was blocked too long", ["route"]
+)
+
+# what each task is working on - read by the watchdog thread
+_task_names: Dict[asyncio.Task, str] = {}
+
+
+@contextmanager
+def label_task(name: str) -> Iterator[None]:
+    """name the work of the current task (route or job) for the stall log"""
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    if task is None:
+        yield
+        return
+    previous = _task_names.get(task)
+    _task_names[task] = name
+    try:
+        yield
+    finally:
+        if previous is None:
+            _task_names.pop(task, None)
+        else:
+            _task_names[task] = previous
+
+
+class LoopMonitor:
+    """
+    Measures the event loop lag of this worker with a callback that should
+    run every interval seconds. A watchdog thread notices when the loop has
+    not come around for threshold seconds and logs the stack of the loop
+    thread and the route or job running - usually a blocking call (bcrypt,
+    requests, the stripe or sendgrid sdk, ...) in async code.
+    """
+
+    def __init__(self, interval: float, threshold: float):
+        self.interval = interval
+        self.threshold = threshold
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._heartbeat = time.monotonic()
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    async def _tick(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            self._heartbeat = now = time.monotonic()
+            EVENT_LOOP_LAG.observe(max(now - expected, 0))
+
+    def _watch(self):
+        reported = None
+        while not self._stopped.wait(self.interval):
+            heartbeat = self._heartbeat
+            if time.monotonic() - heartbeat < self.threshold or heartbeat == reported:
+                continue
+            # one report per stall
+            reported = heartbeat
+            self._report()
+
+    def _report(self):
+        frame = sys._current_frames().get(self._loop_thread_id)
+        task = asyncio.current_task(self._loop)
+        route = _task_names.get(task, "-") if task else "-"
+        stack = "".join(traceback.format_stack(frame)) if frame else ""
+        EVENT_LOOP_STALLS.labels(route).inc()
+        logger.warning(
+            f"event loop blocked for more than {self.threshold}s in {route}:\n{stack}"
+        )
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.ensure_future(self._tick())
+        self._watchdog = threading.Thread(
+            target=self._watch, name="loop-monitor", daemon=True
+        )
+        self._watchdog.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._task:
+            self._task.cancel()
+        if self._watchdog:
+            self._watchdog.join()
+
+
+loop_monitor = LoopMonitor(
+    interval=settings.LOOP_MONITOR_INTERVAL, threshold=settings.LOOP_LAG_THRESHOLD
+)
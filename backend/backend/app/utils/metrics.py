@@ -0,0 +1,236 @@
+import contextvars
+import os
+import resource
+import time
+from collections import Counter as CounterDict
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Optional, Tuple
+
+import sqlalchemy as sa
+from loguru import logger
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from ..core.config import settings
+from .loop_monitor import label_task
+from .slow_query import explaining, slow_queries
+
+# with more gunicorn workers the metrics are written to files in
+# PROMETHEUS_MULTIPROC_DIR (see gunicorn_conf.py) and summed up on scrape
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Request latency",
+    ["method", "route"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+REQUESTS = Counter(
+    "http_requests", "Requests by status code", ["method", "route", "status"]
+)
+IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "Requests being handled",
+    ["method", "route"],
+    multiprocess_mode="livesum",
+)
+REQUEST_DB_STATEMENTS = Histogram(
+    "http_request_db_statements",
+    "SQL statements executed per request",
+    ["method", "route"],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+)
+REQUEST_DB_DURATION = Histogram(
+    "http_request_db_duration_seconds",
+    "Time spent in the database per request",
+    ["method", "route"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+DB_STATEMENT_DURATION = Histogram(
+    "db_statement_duration_seconds",
+    "Duration of each SQL statement - requests and background jobs",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1),
+)
+HTTP_CLIENT_EVENTS = Counter(
+    "http_client_events", "Outbound http client pool events", ["client", "event"]
+)
+EMAIL_OUTBOX_EMAILS = Counter(
+    "email_outbox_emails", "Emails handed to sendgrid", ["result"]
+)
+EMAIL_OUTBOX_SEND_DURATION = Histogram(
+    "email_outbox_send_duration_seconds", "Duration of each sendgrid request"
+)
+# one sample per live worker (pid label) - how many workers fit on a box
+WORKER_MEMORY = Gauge(
+    "worker_resident_memory_bytes",
+    "Resident memory of each worker",
+    multiprocess_mode="liveall",
+)
+
+# seconds between updates of the worker memory
+MEMORY_INTERVAL = 15
+
+
+def resident_memory() -> Optional[int]:
+    """the resident set size of this process in bytes - linux only"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def update_worker_memory():
+    if (rss := resident_memory()) is not None:
+        WORKER_MEMORY.set(rss)
+
+
+class DBStats:
+    """the database work of a request or job"""
+
+    __slots__ = ("name", "statements", "seconds", "shapes")
+
+    def __init__(self, name: str, record_shapes: bool = False):
+        self.name = name
+        self.statements = 0
+        self.seconds = 0.0
+        # statement text (parameters are placeholders) -> times executed
+        self.shapes: Optional[CounterDict] = CounterDict() if record_shapes else None
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int]]:
+        """statements run at least threshold times - usually an n+1"""
+        if not self.shapes:
+            return []
+        return [(shape, n) for shape, n in self.shapes.most_common() if n >= threshold]
+
+
+# the database work of the current request or job
+_db_stats: "contextvars.ContextVar[Optional[DBStats]]" = contextvars.ContextVar(
+    "db_stats", default=None
+)
+
+# called with (name, stats) when a request or job is done - used by the tests
+query_observers: List[Callable[[str, DBStats], None]] = []
+
+
+def _report(name: str, stats: DBStats):
+    for observer in query_observers:
+        observer(name, stats)
+    if not settings.QUERY_DEBUG:
+        return
+    logger.debug(f"{name}: {stats.statements} statements in {stats.seconds:.3f}s")
+    for shape, n in stats.repeated(settings.QUERY_REPEAT_THRESHOLD):
+        logger.warning(f"{name}: same statement run {n} times (n+1?): {shape}")
+
+
+@contextmanager
+def track_queries(name: str) -> Iterator[DBStats]:
+    """count the statements run within - reported when done"""
+    stats = DBStats(name, record_shapes=settings.QUERY_DEBUG or bool(query_observers))
+    token = _db_stats.set(stats)
+    try:
+        with label_task(name):
+            yield stats
+    finally:
+        _db_stats.reset(token)
+        _report(name, stats)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    if explaining.get():
+        return
+    DB_STATEMENT_DURATION.observe(elapsed)
+    # sqlalchemy runs the sync engine in a greenlet sharing the task's context
+    stats = _db_stats.get()
+    if stats:
+        stats.statements += 1
+        stats.seconds += elapsed
+        if stats.shapes is not None:
+            stats.shapes[statement] += 1
+    threshold = settings.SLOW_QUERY_THRESHOLD
+    if threshold is not None and elapsed >= threshold:
+        slow_queries.record(
+            conn.engine, statement, parameters, elapsed, stats.name if stats else None
+        )
+
+
+def instrument_engine(engine):
+    """time every statement of the (async) engine"""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    sa.event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    sa.event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def route_path(scope: Scope) -> str:
+    """the route template (/users/{user_id}) so the labels stay few"""
+    app = scope.get("app")
+    partial = None
+    for route in getattr(app, "routes", []):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+        if match == Match.PARTIAL and partial is None:
+            partial = route.path
+    return partial or "unmatched"
+
+
+class MetricsMiddleware:
+    """latency, status, in-flight and database work per route"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self._memory_updated = 0.0
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method, route = scope["method"], route_path(scope)
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        in_progress = IN_PROGRESS.labels(method, route)
+        in_progress.inc()
+        start = time.perf_counter()
+        try:
+            with track_queries(f"{method} {route}") as stats:
+                await self.app(scope, receive, send_with_status)
+        finally:
+            REQUEST_DURATION.labels(method, route).observe(time.perf_counter() - start)
+            REQUESTS.labels(method, route, str(status_code)).inc()
+            REQUEST_DB_STATEMENTS.labels(method, route).observe(stats.statements)
+            REQUEST_DB_DURATION.labels(method, route).observe(stats.seconds)
+            in_progress.dec()
+            if start - self._memory_updated >= MEMORY_INTERVAL:
+                self._memory_updated = start
+                update_worker_memory()
+
+
+def render() -> Tuple[bytes, str]:
+    """the metrics of all the workers in the prometheus text format"""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -1,7 +1,18 @@
-import requests
-from nameparser import HumanName
+import asyncio
+import re
+from typing import Iterable, Set
+
+import aiohttp
+from loguru import logger
+from tenacity import (
+    AsyncRetrying,
+    retry_if_exception_type,
+    stop_after_attempt,
+    wait_exponential,
+)
 
 from ..core.config import settings
+from .http import http_clients
 
 headers = {
     "Authorization": settings.NETS_EASY_SECRET_KEY,
@@ -9,8 +20,93 @@ headers = {
     "Accept": "application/json",
 }
 
+# nets easy payment ids are 32 hex chars (stripe ids are prefixed pi_)
+PAYMENT_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+RETRY_ATTEMPTS = 3
+RETRY_WAIT = wait_exponential(multiplier=0.2, max=2)
+
+
+class NetsEasyError(Exception):
+    pass
+
+
+class NetsEasyRetryableError(NetsEasyError):
+    pass
+
+
+class NetsEasyRateLimitedError(NetsEasyRetryableError):
+    pass
+
+
+# reads are safe to repeat
+GET_RETRY_ON = (NetsEasyRetryableError, aiohttp.ClientError, asyncio.TimeoutError)
+# a create payment that timed out or got a 5xx may still have created the
+# payment - only retried when nets easy surely did not act on it
+POST_RETRY_ON = (NetsEasyRateLimitedError, aiohttp.ClientConnectorError)
+
+
+def is_payment_id(payment_id: str) -> bool:
+    return bool(payment_id and PAYMENT_ID_RE.match(payment_id))
+
+
+def _log_retry(state):
+    logger.warning(
+        f"nets easy attempt {state.attempt_number} failed: {state.outcome.exception()}"
+    )
+
+
+def _get_session() -> aiohttp.ClientSession:
+    return http_clients.get("netseasy", headers=headers)
+
+
+def _retrying(retry_on=GET_RETRY_ON) -> AsyncRetrying:
+    return AsyncRetrying(
+        stop=stop_after_attempt(RETRY_ATTEMPTS),
+        wait=RETRY_WAIT,
+        retry=retry_if_exception_type(retry_on),
+        before_sleep=_log_retry,
+        reraise=True,
+    )
+
+
+async def _raise_for_status(resp: aiohttp.ClientResponse, action: str):
+    text = await resp.text()
+    if resp.status == 429:
+        raise NetsEasyRateLimitedError(
+            f"nets easy rate limited server status code: {resp.status} {text}"
+        )
+    # nets easy is having a bad time - worth another try
+    if resp.status >= 500:
+        raise NetsEasyRetryableError(
+            f"nets easy unavailable server status code: {resp.status} {text}"
+        )
+    raise NetsEasyError(f"could not {action} server status code: {resp.status} {text}")
+
+
+async def _post_payment(post_data: dict) -> str:
+    async with _get_session().post(
+        f"{settings.NETS_EASY_BASE_URL}/v1/payments", json=post_data
+    ) as resp:
+        if resp.status == 201:
+            data = await resp.json()
+            return data["paymentId"]
+        await _raise_for_status(resp, "create payment_id")
+
+
+async def _get_payment(payment_id: str) -> dict:
+    async with _get_session().get(
+        f"{settings.NETS_EASY_BASE_URL}/v1/payments/{payment_id}"
+    ) as resp:
+        if resp.status == 200:
+            data = await resp.json()
+            return data["payment"]
+        await _raise_for_status(resp, f"get payment {payment_id}")
+
 
 async def create_payment_id(order_id, product, user):
+    from nameparser import HumanName  # slow to import - only needed at checkout
+
     human_name = HumanName(user.name)
     post_data = {
         "checkout": {
@@ -61,16 +157,36 @@ async def create_payment_id(order_id, product, user):
             "reference": str(order_id),
         },
     }
-    req = requests.post(
-        f"{settings.NETS_EASY_BASE_URL}/v1/payments",
-        headers=headers,
-        json=post_data,
-        timeout=(5, 10),
-    )
-    if req.status_code == 201:
-        data = req.json()
-        return data["paymentId"]
+    async for attempt in _retrying(POST_RETRY_ON):
+        with attempt:
+            return await _post_payment(post_data)
 
-    raise Exception(
-        f"could not create payment_id server status code: {req.status_code} {req.text}"
-    )
+
+async def get_payment(payment_id: str) -> dict:
+    async for attempt in _retrying():
+        with attempt:
+            return await _get_payment(payment_id)
+
+
+async def paid_payment_ids(payment_ids: Iterable[str]) -> Set[str]:
+    """
+    the payment ids that are completed (reserved or charged)
+
+    nets easy has no endpoint to list payments so this is a lookup per
+    payment - run a few at a time over the pooled session
+    """
+    semaphore = asyncio.Semaphore(settings.NETS_EASY_MAX_CONCURRENCY)
+
+    async def _paid(payment_id: str) -> bool:
+        async with semaphore:
+            try:
+                payment = await get_payment(payment_id)
+            except (NetsEasyError, aiohttp.ClientError, asyncio.TimeoutError) as ex:
+                logger.warning(f"could not check nets easy payment: {ex}")
+                return False
+        summary = payment.get("summary", {})
+        return bool(summary.get("reservedAmount") or summary.get("chargedAmount"))
+
+    payment_ids = list(payment_ids)
+    paid = await asyncio.gather(*[_paid(payment_id) for payment_id in payment_ids])
+    return {payment_id for payment_id, ok in zip(payment_ids, paid) if ok}
@@ -0,0 +1,151 @@
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import List, Optional
+
+from fastapi import HTTPException
+from fastapi.security import SecurityScopes
+from loguru import logger
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import MutableHeaders
+from starlette.requests import Request
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .. import deps
+from ..core.config import settings
+
+PROFILE_NAME = re.compile(r"^[\w.-]+\.folded$")
+PROFILE_QUERY = re.compile(rb"(^|&)profile=")
+
+
+def _frame_name(code) -> str:
+    filename = code.co_filename
+    if "site-packages" in filename:
+        filename = filename.rsplit("site-packages", 1)[1].lstrip(os.sep)
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+class Sampler:
+    """
+    Samples the stack of one thread every interval seconds into folded stacks
+    (one "outer;...;inner count" line per stack) - the input of flamegraph.pl
+    and speedscope.
+    """
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_name(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {n}\n" for stack, n in self.stacks.most_common())
+
+
+async def _is_admin(scope: Scope) -> bool:
+    request = Request(scope)
+    try:
+        token = await deps.reusable_oauth2(request)
+        await deps.get_current_user_id(SecurityScopes(["admin"]), token)
+    except HTTPException:
+        return False
+    return True
+
+
+def _wants_profile(scope: Scope) -> bool:
+    for name, _ in scope["headers"]:
+        if name == b"x-profile":
+            return True
+    return PROFILE_QUERY.search(scope.get("query_string", b"")) is not None
+
+
+def _save(name: str, report: str):
+    directory = Path(settings.PROFILING_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    (directory / name).write_text(report)
+    # only keep the newest reports
+    reports = sorted(directory.glob("*.folded"), key=lambda p: p.stat().st_mtime)
+    for old in reports[: -settings.PROFILING_KEEP]:
+        old.unlink(missing_ok=True)
+
+
+def list_profiles() -> List[str]:
+    directory = Path(settings.PROFILING_DIR)
+    if not directory.is_dir():
+        return []
+    reports = sorted(directory.glob("*.folded"), key=lambda p: p.stat().st_mtime)
+    return [report.name for report in reversed(reports)]
+
+
+def read_profile(name: str) -> Optional[str]:
+    if not PROFILE_NAME.match(name):
+        return None
+    path = Path(settings.PROFILING_DIR) / name
+    return path.read_text() if path.is_file() else None
+
+
+class ProfilingMiddleware:
+    """
+    Profile a single request when an admin asks for it with a "X-Profile"
+    header or a "profile" query parameter. The folded stacks of the event
+    loop thread are stored in PROFILING_DIR and named in the X-Profile
+    response header. Other requests only pay for the header check.
+
+    Sync endpoints run in the threadpool and are not part of the samples.
+    The samples cover the whole event loop thread, so other requests running
+    on the same worker at the same time show up in the profile as well.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or not _wants_profile(scope)
+            or not await _is_admin(scope)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        path = re.sub(r"[^\w-]+", "_", scope["path"]).strip("_") or "root"
+        name = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        name = f"{name}-{scope['method']}-{path}.folded"
+
+        async def send_with_name(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(raw=message.setdefault("headers", []))
+                headers["X-Profile"] = name
+            await send(message)
+
+        sampler = Sampler(threading.get_ident(), settings.PROFILING_INTERVAL)
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_name)
+        finally:
+            sampler.stop()
+            await run_in_threadpool(_save, name, sampler.folded())
+            logger.info(f"profiled {scope['method']} {scope['path']} into {name}")
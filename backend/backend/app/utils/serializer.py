@@ -0,0 +1,168 @@
+from functools import lru_cache
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple, Type
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+from pydantic.fields import (
+    SHAPE_LIST,
+    SHAPE_SEQUENCE,
+    SHAPE_SINGLETON,
+    SHAPE_TUPLE_ELLIPSIS,
+    ModelField,
+)
+from starlette.responses import JSONResponse
+
+Serializer = Callable[[Any], Any]
+Paths = Optional[FrozenSet[str]]
+
+_LIST_SHAPES = {SHAPE_LIST, SHAPE_SEQUENCE, SHAPE_TUPLE_ELLIPSIS}
+
+
+def _is_model(type_: Any) -> bool:
+    return isinstance(type_, type) and issubclass(type_, BaseModel)
+
+
+def _child(paths: Paths, name: str) -> Paths:
+    if paths is None:
+        return None
+    prefix = f"{name}."
+    return frozenset(p[len(prefix) :] for p in paths if p.startswith(prefix))
+
+
+def _child_fields(fields: Paths, name: str) -> Paths:
+    # a relation named without any of its fields is included in full
+    return _child(fields, name) or None
+
+
+def included(fields: Paths, expand: Paths, path: str) -> bool:
+    """
+    is the relation at the dotted path wanted by the sparse fieldset
+
+    * no fields and no expand: everything as before
+    * expand: the listed relations (and their parents)
+    * only fields: the relations named in fields
+    """
+    name, _, rest = path.partition(".")
+    if expand is not None:
+        ok = name in expand or any(p.startswith(f"{name}.") for p in expand)
+    elif fields is not None:
+        ok = name in fields or any(p.startswith(f"{name}.") for p in fields)
+    else:
+        ok = True
+    if ok and rest:
+        return included(_child_fields(fields, name), _child(expand, name), rest)
+    return ok
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, BaseModel):
+        return obj.dict(by_alias=True)
+    raise TypeError(f"type {type(obj)} is not json serializable")
+
+
+class ORJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_default)
+
+
+def _pydantic_serializer(schema: Type[BaseModel]) -> Serializer:
+    # the slow path for schemas with validators as they could change the values
+    def serialize(obj: Any) -> Any:
+        if isinstance(obj, dict):
+            return jsonable_encoder(schema.parse_obj(obj))
+        return jsonable_encoder(schema.from_orm(obj))
+
+    return serialize
+
+
+def _field_serializer(
+    field: ModelField, fields: Paths, expand: Paths
+) -> Optional[Serializer]:
+    """None when the value can be handed to orjson as it is"""
+    type_ = field.type_
+    if not _is_model(type_):
+        return None
+
+    # looked up on use - schemas can reference each other
+    if field.shape == SHAPE_SINGLETON:
+
+        def serialize_one(value: Any) -> Any:
+            if value is None:
+                return None
+            return get_serializer(type_, fields, expand)(value)
+
+        return serialize_one
+    if field.shape in _LIST_SHAPES:
+
+        def serialize_list(value: Any) -> Any:
+            serialize = get_serializer(type_, fields, expand)
+            return [serialize(item) for item in value]
+
+        return serialize_list
+    return lambda value: jsonable_encoder(value)
+
+
+def _compile(schema: Type[BaseModel], fields: Paths, expand: Paths) -> Serializer:
+    if (
+        schema.__validators__
+        or schema.__pre_root_validators__
+        or schema.__post_root_validators__
+    ):
+        return _pydantic_serializer(schema)
+
+    # only filter the plain fields on this level if any are asked for
+    names = fields and {f for f in fields if "." not in f}
+    getters: List[Tuple[str, str, Any, Optional[Serializer]]] = []
+    for field in schema.__fields__.values():
+        if _is_model(field.type_):
+            if not included(fields, expand, field.name):
+                continue
+            serializer = _field_serializer(
+                field, _child_fields(fields, field.name), _child(expand, field.name)
+            )
+        elif names and field.name not in names:
+            continue
+        else:
+            serializer = None
+        getters.append((field.alias, field.name, field.get_default(), serializer))
+
+    def serialize(obj: Any) -> Dict[str, Any]:
+        result = {}
+        is_dict = isinstance(obj, dict)
+        for alias, name, default, field_serializer in getters:
+            value = obj.get(name, default) if is_dict else getattr(obj, name, default)
+            if field_serializer is not None:
+                value = field_serializer(value)
+            result[alias] = value
+        return result
+
+    return serialize
+
+
+@lru_cache(maxsize=256)
+def get_serializer(
+    schema: Type[BaseModel], fields: Paths = None, expand: Paths = None
+) -> Serializer:
+    """
+    serializer for a response schema reading orm attributes (or dict keys)
+    directly into plain python types - generated once per schema and sparse
+    fieldset (dotted paths of fields and relations to include)
+    """
+    return _compile(schema, fields, expand)
+
+
+def fast_response(
+    schema: Type[BaseModel],
+    obj: Any,
+    fields: Paths = None,
+    expand: Paths = None,
+    **kwargs: Any,
+) -> ORJSONResponse:
+    """
+    respond with obj serialized by schema without validating it through
+    pydantic first - only for data coming from the database.
+
+    keep response_model on the route for the openapi docs
+    """
+    return ORJSONResponse(get_serializer(schema, fields, expand)(obj), **kwargs)
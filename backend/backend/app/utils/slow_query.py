@@ -0,0 +1,112 @@
+import asyncio
+import contextvars
+import re
+import time
+from typing import Any, Dict, Optional, Set
+
+from loguru import logger
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from ..core.config import settings
+
+# an explain never holds a connection for long
+EXPLAIN_TIMEOUT_MS = 10_000
+
+# set in the explain task - its statements are not counted or logged
+explaining: "contextvars.ContextVar[bool]" = contextvars.ContextVar(
+    "explaining", default=False
+)
+
+
+_LOCKING = re.compile(r"\bFOR (UPDATE|NO KEY UPDATE|SHARE|KEY SHARE)\b")
+
+# functions with side effects that outlive the rolled back explain - eg. a
+# session level advisory lock would stay on the pooled connection
+_SIDE_EFFECTS = re.compile(
+    r"\b(PG_\w*ADVISORY\w*|NEXTVAL|SETVAL|SET_CONFIG|PG_NOTIFY"
+    r"|PG_CANCEL_BACKEND|PG_TERMINATE_BACKEND)\s*\("
+)
+
+
+def _explainable(statement: str) -> bool:
+    # EXPLAIN ANALYZE runs the statement - only plain selects are safe to repeat
+    sql = statement.lstrip().upper()
+    return (
+        sql.startswith("SELECT")
+        and not _LOCKING.search(sql)
+        and not _SIDE_EFFECTS.search(sql)
+    )
+
+
+class SlowQueryLog:
+    """
+    Logs statements slower than SLOW_QUERY_THRESHOLD with the route or job
+    running them. With SLOW_QUERY_EXPLAIN the plan of a slow select is
+    captured by a background task on its own connection - at most once per
+    statement every SLOW_QUERY_EXPLAIN_INTERVAL seconds.
+    """
+
+    def __init__(self):
+        self._explained: Dict[str, float] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    def record(
+        self,
+        engine: Engine,
+        statement: str,
+        parameters: Any,
+        elapsed: float,
+        name: Optional[str],
+    ):
+        # no parameters in the log - they can hold personal data
+        logger.warning(f"slow query {elapsed:.3f}s in {name or '-'}: {statement}")
+        if settings.SLOW_QUERY_EXPLAIN and _explainable(statement):
+            self._schedule_explain(engine, statement, parameters, name)
+
+    def _schedule_explain(
+        self, engine: Engine, statement: str, parameters: Any, name: Optional[str]
+    ):
+        now = time.monotonic()
+        explained_at = self._explained.get(statement)
+        if explained_at and now - explained_at < settings.SLOW_QUERY_EXPLAIN_INTERVAL:
+            return
+        if len(self._explained) > 1000:
+            self._explained.clear()
+        self._explained[statement] = now
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        task = loop.create_task(
+            self._explain(AsyncEngine(engine), statement, parameters, name)
+        )
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _explain(
+        self, engine: AsyncEngine, statement: str, parameters: Any, name: Optional[str]
+    ):
+        explaining.set(True)
+        try:
+            async with engine.connect() as conn:
+                await conn.exec_driver_sql(
+                    f"SET LOCAL statement_timeout = {EXPLAIN_TIMEOUT_MS}"
+                )
+                result = await conn.exec_driver_sql(
+                    f"EXPLAIN (ANALYZE, BUFFERS) {statement}", parameters
+                )
+                plan = "\n".join(row[0] for row in result)
+                # rolled back when the connection is returned
+        except Exception as e:
+            logger.warning(f"explain of slow query in {name or '-'} failed: {e}")
+            return
+        logger.warning(f"plan of slow query in {name or '-'}: {statement}\n{plan}")
+
+    async def wait(self):
+        """wait for the running explains"""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+slow_queries = SlowQueryLog()
@@ -0,0 +1,96 @@
+import hashlib
+import mimetypes
+import os
+from typing import Dict, NamedTuple
+
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.responses import Response
+from starlette.staticfiles import PathLike, StaticFiles
+from starlette.types import Scope
+
+from .compression import compress, negotiate, supported_encodings
+
+# best compression as it is only done once at startup
+_LEVELS = {"br": 11, "gzip": 9}
+
+
+class _Asset(NamedTuple):
+    media_type: str
+    # per encoding - the variants differ byte for byte so they can not share
+    # a strong etag
+    etags: Dict[str, str]
+    bodies: Dict[str, bytes]
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """
+    Static files read and compressed once at startup and served from memory
+    with a hashed etag. Html gets revalidated on every use - the rest is
+    cached by the browser for max_age seconds.
+
+    Only for a small directory of assets shipped with the app.
+    """
+
+    def __init__(self, *, directory: PathLike, max_age: int = 60 * 60 * 24 * 7):
+        super().__init__(directory=directory)
+        self.max_age = max_age
+        self.assets: Dict[str, _Asset] = {}
+        for root, _, files in os.walk(directory):
+            for name in files:
+                full_path = os.path.join(root, name)
+                self.assets[os.path.relpath(full_path, directory)] = self._load(
+                    full_path
+                )
+
+    @staticmethod
+    def _load(full_path: str) -> _Asset:
+        with open(full_path, "rb") as f:
+            body = f.read()
+        media_type = mimetypes.guess_type(full_path)[0] or "text/plain"
+        bodies = {"identity": body}
+        for encoding in supported_encodings():
+            compressed = compress(body, encoding, level=_LEVELS[encoding])
+            if len(compressed) < len(body):
+                bodies[encoding] = compressed
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        etags = {
+            encoding: f'"{digest}"'
+            if encoding == "identity"
+            else f'"{digest}-{encoding}"'
+            for encoding in bodies
+        }
+        return _Asset(media_type=media_type, etags=etags, bodies=bodies)
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        if scope["method"] not in ("GET", "HEAD"):
+            raise HTTPException(status_code=405)
+        asset = self.assets.get(path)
+        if asset is None:
+            raise HTTPException(status_code=404)
+
+        request_headers = Headers(scope=scope)
+        cache_control = (
+            "no-cache"
+            if asset.media_type == "text/html"
+            else f"public, max-age={self.max_age}"
+        )
+        encoding = negotiate(request_headers.get("accept-encoding", ""))
+        if encoding not in asset.bodies:
+            encoding = "identity"
+        headers = {
+            "ETag": asset.etags[encoding],
+            "Cache-Control": cache_control,
+            "Vary": "Accept-Encoding",
+        }
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        if_none_match = request_headers.get("if-none-match", "")
+        if asset.etags[encoding] in if_none_match or if_none_match == "*":
+            return Response(status_code=304, headers=headers)
+
+        body = asset.bodies[encoding]
+        if scope["method"] == "HEAD":
+            headers["Content-Length"] = str(len(body))
+            body = b""
+        return Response(body, media_type=asset.media_type, headers=headers)
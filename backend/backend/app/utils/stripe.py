@@ -1,17 +1,51 @@
-import stripe
+import asyncio
+import calendar
+import datetime
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from types import ModuleType
+from typing import Set
 
 from ..core.config import settings
 
-stripe.api_key = settings.STRIPE_API_KEY
 
+def sdk() -> ModuleType:
+    """the stripe sdk - slow to import so only done on first use"""
+    import stripe
 
-def create_payment_intent(
+    if stripe.api_key is None:
+        stripe.api_key = settings.STRIPE_API_KEY
+    return stripe
+
+
+# the stripe sdk is blocking - run it on its own small pool so slow stripe
+# calls neither stall the event loop nor eat the shared starlette threadpool
+_executor = ThreadPoolExecutor(
+    max_workers=settings.STRIPE_MAX_CONCURRENCY, thread_name_prefix="stripe"
+)
+
+# payment intents in these states can still be paid by the client
+REUSABLE_INTENT_STATUSES = {
+    "requires_payment_method",
+    "requires_confirmation",
+    "requires_action",
+}
+
+
+async def _run(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, partial(func, *args, **kwargs))
+
+
+async def create_payment_intent(
     stripe_customer_id: str,
     amount: int,
     statement_descriptor_suffix: str,
     metadata: dict,
 ) -> dict:
-    return stripe.PaymentIntent.create(
+    return await _run(
+        sdk().PaymentIntent.create,
         customer=stripe_customer_id,
         statement_descriptor_suffix=statement_descriptor_suffix,
         amount=amount,
@@ -21,10 +55,63 @@ def create_payment_intent(
     )
 
 
-def create_customer(email: str, name: str, metadata: dict) -> str:
-    customer = stripe.Customer.create(email=email, name=name, metadata=metadata)
+async def retrieve_payment_intent(payment_intent_id: str) -> dict:
+    return await _run(sdk().PaymentIntent.retrieve, payment_intent_id)
+
+
+def _succeeded_payment_intents(created_gte: int) -> Set[str]:
+    # auto paging follows has_more - 100 intents per list call
+    intents = sdk().PaymentIntent.list(created={"gte": created_gte}, limit=100)
+    return {
+        intent.id
+        for intent in intents.auto_paging_iter()
+        if intent.status == "succeeded"
+    }
+
+
+async def succeeded_payment_intents(created_gte: datetime.datetime) -> Set[str]:
+    """ids of the succeeded payment intents created since created_gte (utc)"""
+    return await _run(
+        _succeeded_payment_intents, calendar.timegm(created_gte.utctimetuple())
+    )
+
+
+async def create_customer(email: str, name: str, metadata: dict) -> str:
+    customer = await _run(
+        sdk().Customer.create, email=email, name=name, metadata=metadata
+    )
     return customer.id
 
 
-def update_customer(stripe_customer_id: str, email: str, name: str) -> dict:
-    return stripe.Customer.modify(stripe_customer_id, email=email, name=name)
+async def update_customer(stripe_customer_id: str, email: str, name: str) -> dict:
+    return await _run(sdk().Customer.modify, stripe_customer_id, email=email, name=name)
+
+
+def customer_fingerprint(email: str, name: str) -> str:
+    return hashlib.sha256(f"{email}\n{name}".encode("utf-8")).hexdigest()
+
+
+async def sync_customer(user) -> dict:
+    """
+    ensure the user exists as a customer in stripe with current name and email
+
+    only calls stripe when something changed since last sync and returns the
+    fields to update on the user (empty if nothing changed)
+    """
+    fingerprint = customer_fingerprint(user.email, user.name)
+    if not user.stripe_customer_id:
+        stripe_customer_id = await create_customer(
+            email=user.email, name=user.name, metadata={"user_id": user.id}
+        )
+        return {
+            "stripe_customer_id": stripe_customer_id,
+            "stripe_customer_fingerprint": fingerprint,
+        }
+    if user.stripe_customer_fingerprint != fingerprint:
+        await update_customer(
+            stripe_customer_id=user.stripe_customer_id,
+            email=user.email,
+            name=user.name,
+        )
+        return {"stripe_customer_fingerprint": fingerprint}
+    return {}
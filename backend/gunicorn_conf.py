@@ -1,6 +1,9 @@
+import gc
 import json
 import multiprocessing
 import os
+import resource
+import shutil
 
 workers_per_core_str = os.getenv("WORKERS_PER_CORE", "1")
 max_workers_str = os.getenv("MAX_WORKERS")
@@ -35,6 +38,9 @@ use_errorlog = errorlog_var or None
 graceful_timeout_str = os.getenv("GRACEFUL_TIMEOUT", "120")
 timeout_str = os.getenv("TIMEOUT", "120")
 keepalive_str = os.getenv("KEEP_ALIVE", "5")
+preload_app_str = os.getenv("PRELOAD_APP", "false")
+max_requests_str = os.getenv("MAX_REQUESTS", "10000")
+max_requests_jitter_str = os.getenv("MAX_REQUESTS_JITTER", "1000")
 
 # Gunicorn config variables
 loglevel = use_loglevel
@@ -46,6 +52,50 @@ accesslog = use_accesslog
 graceful_timeout = int(graceful_timeout_str)
 timeout = int(timeout_str)
 keepalive = int(keepalive_str)
+# import the app once in the master - the workers share its memory copy-on-write
+preload_app = preload_app_str.lower() in ("1", "true", "yes")
+# recycle workers to bound slow memory growth - the jitter keeps them from
+# restarting all at once
+max_requests = int(max_requests_str)
+max_requests_jitter = int(max_requests_jitter_str)
+
+# each worker writes its prometheus metrics to files here - /metrics sums them
+prometheus_multiproc_dir = os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR", "/dev/shm/prometheus"
+)
+# a preloaded app creates its metrics before on_starting runs
+os.makedirs(prometheus_multiproc_dir, exist_ok=True)
+
+
+def on_starting(server):
+    # start from zero - the files of an earlier run would be counted again
+    shutil.rmtree(prometheus_multiproc_dir, ignore_errors=True)
+    os.makedirs(prometheus_multiproc_dir)
+
+
+def when_ready(server):
+    if preload_app:
+        # the garbage of importing the app is not worth sharing
+        gc.collect()
+
+
+def pre_fork(server, worker):
+    if preload_app:
+        # keep the gc of the workers from touching (and so copying) the pages
+        # of the objects created by the master
+        gc.freeze()
+
+
+def worker_exit(server, worker):
+    # the peak memory of a worker - ru_maxrss is in kilobytes on linux
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    server.log.info(f"worker {worker.pid} exiting - peak resident memory {peak:.0f}MB")
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
 
 
 # For debugging and testing
@@ -56,6 +106,9 @@ log_data = {
     "graceful_timeout": graceful_timeout,
     "timeout": timeout,
     "keepalive": keepalive,
+    "preload_app": preload_app,
+    "max_requests": max_requests,
+    "max_requests_jitter": max_requests_jitter,
     "errorlog": errorlog,
     "accesslog": accesslog,
     # Additional, non-gunicorn variables
@@ -64,4 +117,4 @@ log_data = {
     "host": host,
     "port": port,
 }
-print(json.dumps(log_data))
\ No newline at end of file
+print(json.dumps(log_data))
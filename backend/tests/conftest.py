@@ -1,17 +1,25 @@
 import datetime
+import json
+from contextlib import contextmanager
+import threading
 import uuid
 import random
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
 
 import pytest
 import sqlalchemy as sa
 from backend.app import models
+from backend.app.core import utils
 from backend.app.core.config import settings
 from backend.app.core.security import get_password_hash
 from backend.app.main import app
+from backend.app.utils import metrics
 from backend.app.utils.models_utils import PaymentStatusEnum
 from faker import Faker
 from fastapi.testclient import TestClient
 from pytest_pgsql.time import SQLAlchemyFreezegun
+from sendgrid import SendGridAPIClient
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 
@@ -23,6 +31,36 @@ def fake_name():
     yield fake.name()
 
 
+@pytest.fixture
+def max_queries():
+    """
+    query budget - fails if a request or job within the block runs more sql
+    statements than allowed, listing the statements that repeat (n+1)
+
+        with max_queries(3):
+            client.get("/users/1")
+    """
+
+    @contextmanager
+    def budget(limit: int):
+        seen = []
+        metrics.query_observers.append(lambda name, stats: seen.append((name, stats)))
+        try:
+            with metrics.track_queries("test"):
+                yield seen
+        finally:
+            metrics.query_observers.pop()
+        for name, stats in seen:
+            repeated = "\n".join(
+                f"{n}x {shape}" for shape, n in stats.repeated(threshold=2)
+            )
+            assert (
+                stats.statements <= limit
+            ), f"{name} ran {stats.statements} statements (max {limit})\n{repeated}"
+
+    return budget
+
+
 @pytest.fixture(scope="session")
 def db():
     engine = sa.create_engine(settings.SQLALCHEMY_DATABASE_URI, echo=True, future=True)
@@ -37,6 +75,7 @@ async def async_engine():
         "postgresql://", "postgresql+asyncpg://"
     )
     engine = create_async_engine(DATABASE_URL)
+    metrics.instrument_engine(engine)
     try:
         yield engine
     finally:
@@ -188,3 +227,36 @@ def auth_client_admin(user_admin: models.User):
     c.headers.update({"Authorization": f"bearer {token}"})
 
     yield c
+
+
+@pytest.fixture
+def fake_sendgrid(monkeypatch):
+    """local fake of the sendgrid mail send api recording the requests"""
+    fake = SimpleNamespace(requests=[], status=202, rejected=set())
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            fake.requests.append(body)
+            recipients = {
+                to["email"] for p in body["personalizations"] for to in p["to"]
+            }
+            # like sendgrid the whole request is refused for one bad recipient
+            self.send_response(400 if recipients & fake.rejected else fake.status)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    host = f"http://127.0.0.1:{server.server_port}"
+    client = SendGridAPIClient("SG.fake", host=host)
+    monkeypatch.setattr(utils, "sendgrid_client", lambda: client)
+    try:
+        yield fake
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -1,3 +1,5 @@
+import datetime
+
 from fastapi import status
 from fastapi.testclient import TestClient
 from jose import jwt
@@ -6,13 +8,16 @@ from backend.app import models
 from backend.app.core.config import settings
 from backend.app.core.security import (
     ALGORITHM,
+    generate_door_access_token,
     generate_password_reset_token,
     get_password_hash,
     verify_password,
     verify_password_reset_token,
     generate_webauthn_state_token,
     verify_webauthn_staten_token,
+    verify_door_access_token,
 )
+from backend.app.utils.models_utils import DoorAccessEnum
 
 
 def test_webauthn_state_token(user_basic: models.User):
@@ -33,6 +38,25 @@ def test_password_reset_token():
     assert verify_password_reset_token("gibberish") is None
 
 
+def test_door_access_token():
+    token, expires = generate_door_access_token(
+        1, DoorAccessEnum.MORNING, datetime.date.today() + datetime.timedelta(days=30)
+    )
+    assert expires > datetime.datetime.utcnow()
+    claims = verify_door_access_token(token)
+    assert claims["sub"] == "1"
+    assert claims["door_access"] == DoorAccessEnum.MORNING
+
+    # a membership that ended yesterday gives an already expired token
+    token, _ = generate_door_access_token(
+        1, DoorAccessEnum.FULL, datetime.date.today() - datetime.timedelta(days=2)
+    )
+    assert verify_door_access_token(token) is None
+
+    # other tokens signed with the same key is not valid at the door
+    assert verify_door_access_token(generate_password_reset_token("a@b.dk")) is None
+
+
 def test_password_hash_verify():
     password = "some_g8_password"
     password_wrong = "wrong_password"
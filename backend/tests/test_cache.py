@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+
+from backend.app.utils.cache import SWRCache
+
+
+class Upstream:
+    def __init__(self):
+        self.calls = 0
+        self.fail = False
+
+    async def fetch(self):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        if self.fail:
+            raise Exception("upstream down")
+        return self.calls
+
+
+async def test_concurrent_misses_share_one_fetch():
+    cache, upstream = SWRCache(ttl=60), Upstream()
+
+    values = await asyncio.gather(*[cache.get("k", upstream.fetch) for _ in range(10)])
+
+    assert values == [1] * 10
+    assert upstream.calls == 1
+    # fresh - served from cache
+    assert await cache.get("k", upstream.fetch) == 1
+    assert upstream.calls == 1
+
+
+async def test_stale_while_revalidate():
+    cache, upstream = SWRCache(ttl=0, max_stale=60), Upstream()
+    assert await cache.get("k", upstream.fetch) == 1
+
+    # stale value served at once and refreshed in the background
+    assert await cache.get("k", upstream.fetch) == 1
+    await asyncio.sleep(0.05)
+    assert upstream.calls == 2
+    assert cache._entries["k"][1] == 2
+
+
+async def test_stale_if_error():
+    cache, upstream = SWRCache(ttl=0), Upstream()
+
+    upstream.fail = True
+    with pytest.raises(Exception):
+        await cache.get("k", upstream.fetch)
+
+    upstream.fail = False
+    assert await cache.get("k", upstream.fetch) == 2
+
+    # upstream fails - serve the last good value
+    upstream.fail = True
+    assert await cache.get("k", upstream.fetch) == 2
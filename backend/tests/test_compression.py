@@ -0,0 +1,79 @@
+import gzip
+
+import pytest
+from backend.app.utils import compression
+from backend.app.utils.compression import compress, negotiate
+from fastapi import status
+from fastapi.testclient import TestClient
+
+
+def test_negotiate():
+    assert negotiate("") is None
+    assert negotiate("gzip, deflate") == "gzip"
+    assert negotiate("gzip;q=0, deflate") is None
+    assert negotiate("identity") is None
+    assert negotiate("*") == compression.supported_encodings()[0]
+    assert gzip.decompress(compress(b"monkey" * 100, "gzip")) == b"monkey" * 100
+
+
+def test_compress_response(auth_client_admin: TestClient):
+    response = auth_client_admin.get("/users", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-encoding"] == "gzip"
+    assert "accept-encoding" in response.headers["vary"].lower()
+    assert response.json()["items"]
+
+    # not asked for
+    response = auth_client_admin.get("/users", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+
+    # too small
+    response = auth_client_admin.get(
+        "/member-types/1", headers={"Accept-Encoding": "gzip"}
+    )
+    assert "content-encoding" not in response.headers
+
+    # binary
+    response = auth_client_admin.get(
+        "/users/1/identicon.png", headers={"Accept-Encoding": "gzip"}
+    )
+    assert "content-encoding" not in response.headers
+
+
+@pytest.mark.skipif(compression.brotli is None, reason="brotli not installed")
+def test_compress_response_brotli(auth_client_admin: TestClient):
+    response = auth_client_admin.get("/users", headers={"Accept-Encoding": "gzip, br"})
+    assert response.headers["content-encoding"] == "br"
+    # decoded by the client
+    assert response.json()["items"]
+
+
+def test_static(client: TestClient):
+    response = client.get("/static/cbor.js", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-encoding"] == "gzip"
+    assert "max-age" in response.headers["cache-control"]
+    assert "CBOR" in response.text
+    etag = response.headers["etag"]
+
+    response = client.get(
+        "/static/cbor.js", headers={"Accept-Encoding": "gzip", "If-None-Match": etag}
+    )
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    # another representation - another etag
+    response = client.get("/static/cbor.js", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+    assert response.headers["etag"] != etag
+    response = client.get(
+        "/static/cbor.js",
+        headers={"Accept-Encoding": "identity", "If-None-Match": etag},
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+    response = client.get("/static/register.html")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["cache-control"] == "no-cache"
+
+    response = client.get("/static/missing.js")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
@@ -1,6 +1,7 @@
 import datetime
 
 import pytest
+import sqlalchemy as sa
 
 from backend.app import crud, models
 
@@ -152,3 +153,69 @@ async def test_create(async_db, scoped_crud, model, obj_in):
     obj = await scoped_crud.create(async_db, obj_in=obj_in)
 
     assert isinstance(obj, model)
+
+
+async def test_member_active(async_db):
+    today = datetime.date.today()
+    for days in (0, -1):
+        await crud.member.create(
+            async_db,
+            obj_in={
+                "user_id": 1,
+                "product_id": 1,
+                "date_start": today - datetime.timedelta(days=365),
+                "date_end": today + datetime.timedelta(days=days),
+            },
+        )
+
+    # active up to and including the last day
+    members = await crud.member.get_multi(
+        async_db, models.Member.user_id == 1, only_active=False
+    )
+    active = {m.date_end: m.active for m in members}
+    assert active[today] is True
+    assert active[today - datetime.timedelta(days=1)] is False
+
+    yesterday = today - datetime.timedelta(days=1)
+    assert (
+        await crud.member.count(
+            async_db,
+            models.Member.user_id == 1,
+            models.Member.active_as_of(yesterday),
+            only_active=False,
+        )
+        == await crud.member.count(async_db, models.Member.user_id == 1) + 1
+    )
+
+    # the active filter is an index condition - not a filter over all rows
+    await async_db.execute(sa.text("SET LOCAL enable_seqscan = off"))
+    query = crud.member._get_multi_sql(models.Member.user_id == 1)
+    plan = "\n".join(
+        row[0]
+        for row in await async_db.execute(
+            sa.text(f"EXPLAIN {query.compile(compile_kwargs={'literal_binds': True})}")
+        )
+    )
+    assert "ix_member_user_id_date_end" in plan
+    assert "date_end >= CURRENT_DATE" in plan.split("Index Cond:")[1].split("\n")[0]
+
+
+async def test_resource_version_bump():
+    from backend.app.deps import get_db_context
+
+    name = "test_resource"
+    async with get_db_context() as db, get_db_context() as reader:
+        version = await crud.resource_version.current(reader, name)
+        await reader.commit()
+
+        await crud.resource_version.bump(db, name)
+        # not committed yet - the other request keeps caching the old version
+        assert await crud.resource_version.current(reader, name) == version
+        await reader.commit()
+        assert await crud.resource_version.current(reader, name, max_age=60) == version
+
+        # seen by the requests of this worker as soon as it is committed
+        await db.commit()
+        assert (
+            await crud.resource_version.current(reader, name, max_age=60) == version + 1
+        )
@@ -1,8 +1,13 @@
+import datetime
+from types import SimpleNamespace
+
 from fastapi import status
 from fastapi.testclient import TestClient
 
 from backend.app import crud, models
 from backend.app.core.config import settings
+from backend.app.core.security import create_access_token, generate_door_access_token
+from backend.app.utils.models_utils import DoorAccessEnum
 
 
 def test_door_access(client: TestClient):
@@ -17,3 +22,47 @@ def test_door_access(client: TestClient):
     assert response.status_code == status.HTTP_403_FORBIDDEN
 
     # TODO: test morning by freeze time
+
+
+def test_door_access_batch(client: TestClient):
+    headers = {"api_key": settings.DOOR_API_KEY}
+    now = datetime.datetime.utcnow().replace(microsecond=0)
+    payload = [
+        {"key": "some-door-id2", "timestamp": str(now - datetime.timedelta(minutes=5))},
+        {"key": "some-door-id2", "timestamp": str(now)},
+        {"key": "puccio", "timestamp": str(now)},
+    ]
+    response = client.post("/door-access/batch", headers=headers, json=payload)
+    assert response.status_code == status.HTTP_200_OK
+    assert [v["access"] for v in response.json()] == [True, True, False]
+
+    # replaying the same buffer again should not fail on already stored swipes
+    response = client.post("/door-access/batch", headers=headers, json=payload)
+    assert response.status_code == status.HTTP_200_OK
+
+    # empty batch not allowed
+    response = client.post("/door-access/batch", headers=headers, json=[])
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def test_door_access_token(client: TestClient):
+    headers = {"api_key": settings.DOOR_API_KEY}
+    date_end = datetime.date.today() + datetime.timedelta(days=30)
+
+    token, _ = generate_door_access_token(1, DoorAccessEnum.FULL, date_end)
+    response = client.post("/door-access/token", headers=headers, json={"token": token})
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+
+    token, _ = generate_door_access_token(1, DoorAccessEnum.NOACCESS, date_end)
+    response = client.post("/door-access/token", headers=headers, json={"token": token})
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    response = client.post(
+        "/door-access/token", headers=headers, json={"token": "gibberish"}
+    )
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    # a login token has no audience - it is not a door token
+    token = create_access_token(SimpleNamespace(id=1, scopes="basic"))["access_token"]
+    response = client.post("/door-access/token", headers=headers, json={"token": token})
+    assert response.status_code == status.HTTP_403_FORBIDDEN
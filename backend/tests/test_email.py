@@ -0,0 +1,112 @@
+import sqlalchemy as sa
+from faker import Faker
+
+from backend.app import models
+from backend.app.core.utils import (
+    MailTemplateEnum,
+    outbox_stats,
+    queue_transactional_email,
+    send_outbox,
+)
+
+fake = Faker()
+
+
+async def _outbox(db, emails):
+    query = sa.select(models.EmailOutbox).where(models.EmailOutbox.to_email.in_(emails))
+    return (await db.execute(query)).scalars().all()
+
+
+async def test_send_outbox(async_db, fake_sendgrid):
+    signups = [fake.email(), fake.email()]
+    reset = fake.email()
+    for email in signups:
+        await queue_transactional_email(
+            async_db,
+            to_email=email,
+            template_id=MailTemplateEnum.CONFIRM_SIGNUP,
+            data={"name": "monkey", "confirm_token": email},
+        )
+    await queue_transactional_email(
+        async_db,
+        to_email=reset,
+        template_id=MailTemplateEnum.PASSWORD_RESET,
+        data={"password_reset_token": "token"},
+    )
+    sent_before = outbox_stats["sent"]
+
+    assert await send_outbox(async_db) >= 3
+
+    # one request per template with a personalization per recipient
+    requests = {r["template_id"]: r for r in fake_sendgrid.requests}
+    assert len(requests) == len(fake_sendgrid.requests)
+    signup_request = requests[MailTemplateEnum.CONFIRM_SIGNUP]
+    personalizations = {
+        p["to"][0]["email"]: p["dynamic_template_data"]
+        for p in signup_request["personalizations"]
+    }
+    for email in signups:
+        assert personalizations[email]["confirm_token"] == email
+    reset_request = requests[MailTemplateEnum.PASSWORD_RESET]
+    assert reset in [p["to"][0]["email"] for p in reset_request["personalizations"]]
+
+    async_db.expire_all()
+    for email in await _outbox(async_db, signups + [reset]):
+        assert email.sent_at is not None
+        assert email.attempts == 1
+    assert outbox_stats["sent"] - sent_before >= 3
+
+    # nothing left to send
+    fake_sendgrid.requests.clear()
+    assert await send_outbox(async_db) == 0
+    assert fake_sendgrid.requests == []
+
+
+async def test_send_outbox_failed(async_db, fake_sendgrid):
+    fake_sendgrid.status = 500
+    email = fake.email()
+    await queue_transactional_email(
+        async_db,
+        to_email=email,
+        template_id=MailTemplateEnum.PAYMENT_SUCCEEDED,
+        data={"product_name": "Full membership", "price": 1000},
+    )
+
+    assert await send_outbox(async_db) == 0
+
+    async_db.expire_all()
+    (outbox,) = await _outbox(async_db, [email])
+    assert outbox.sent_at is None
+    assert outbox.attempts == 1
+    assert outbox.last_error
+
+    # retried on the next run
+    fake_sendgrid.status = 202
+    assert await send_outbox(async_db) >= 1
+    async_db.expire_all()
+    (outbox,) = await _outbox(async_db, [email])
+    assert outbox.sent_at is not None
+    assert outbox.attempts == 2
+
+
+async def test_send_outbox_rejected_recipient(async_db, fake_sendgrid):
+    emails = [fake.email() for _ in range(3)]
+    fake_sendgrid.rejected = {emails[1]}
+    for email in emails:
+        await queue_transactional_email(
+            async_db,
+            to_email=email,
+            template_id=MailTemplateEnum.PAYMENT_FAILED,
+            data={"product_name": "Full membership"},
+        )
+
+    await send_outbox(async_db)
+
+    # only the rejected recipient is charged an attempt
+    async_db.expire_all()
+    outbox = {o.to_email: o for o in await _outbox(async_db, emails)}
+    assert outbox[emails[1]].sent_at is None
+    assert outbox[emails[1]].attempts == 1
+    for email in [emails[0], emails[2]]:
+        assert outbox[email].sent_at is not None
+        assert outbox[email].attempts == 1
@@ -0,0 +1,40 @@
+from unittest import mock
+
+import sqlalchemy as sa
+from backend.app import identicon, models
+from backend.app.identicon import IdenticonCache, identicon_key
+
+
+async def test_identicon_cache(tmp_path):
+    cache = IdenticonCache(maxsize=1, directory=str(tmp_path))
+
+    with mock.patch.object(identicon, "render", wraps=identicon.render) as render:
+        image = await cache.get("monkey@test.dk")
+        assert image.startswith(b"\x89PNG")
+        assert await cache.get("monkey@test.dk") == image
+        assert render.call_count == 1
+
+        # the lru only holds one - the other comes from disk
+        await cache.get("another@test.dk")
+        assert await cache.get("monkey@test.dk") == image
+        assert render.call_count == 2
+
+        # another worker reads the disk tier
+        other = IdenticonCache(maxsize=1, directory=str(tmp_path))
+        assert await other.get("another@test.dk")
+        assert render.call_count == 2
+
+    key = identicon_key("monkey@test.dk")
+    assert (tmp_path / key[:2] / f"{key}.png").read_bytes() == image
+
+
+async def test_warm(async_db, tmp_path):
+    cache = IdenticonCache(maxsize=1000, directory=str(tmp_path))
+    active = (
+        await async_db.execute(
+            sa.select(sa.func.count(models.User.id)).where(models.User.active == True)
+        )
+    ).scalar()
+
+    assert await identicon.warm(async_db, cache) == active
+    assert len(list(tmp_path.glob("*/*.png"))) == active
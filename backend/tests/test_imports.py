@@ -0,0 +1,21 @@
+import subprocess
+import sys
+
+# sdks only imported on first use - keeps the worker startup fast
+LAZY_MODULES = ["stripe", "sendgrid", "fido2.server", "squares", "PIL", "nameparser"]
+
+
+def test_lazy_imports():
+    code = (
+        "import sys, time\n"
+        "start = time.perf_counter()\n"
+        "import backend.app.main\n"
+        "print(time.perf_counter() - start)\n"
+        f"print(','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))\n"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    ).stdout.splitlines()
+    assert out[-1] == ""
+    # generous - only here to catch a heavy import sneaking back in
+    assert float(out[-2]) < 5
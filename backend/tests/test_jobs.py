@@ -0,0 +1,84 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import sqlalchemy as sa
+from backend.app import models
+from backend.app.jobs import JobRegistry
+from fastapi import status
+from fastapi.testclient import TestClient
+
+
+async def test_job_runs():
+    registry = JobRegistry()
+
+    @registry.job(cron="0 * * * *", name="test_job_ok")
+    async def ok():
+        pass
+
+    @registry.job(cron="0 * * * *", name="test_job_error")
+    async def error():
+        raise ValueError("no slots today")
+
+    @registry.job(cron="0 * * * *", name="test_job_slow", timeout=0.01)
+    async def slow():
+        await asyncio.sleep(1)
+
+    scheduled_for = datetime.utcnow().replace(microsecond=0)
+    run = await registry.run(registry.jobs["test_job_ok"], scheduled_for)
+    assert run.scheduled_for == scheduled_for
+    assert run.finished_at >= run.started_at
+    assert run.duration >= 0
+    assert run.error is None
+
+    run = await registry.run(registry.jobs["test_job_error"], scheduled_for)
+    assert "ValueError: no slots today" in run.error
+
+    run = await registry.run(registry.jobs["test_job_slow"], scheduled_for)
+    assert run.error == "timed out after 0.01s"
+    assert run.duration < 1
+
+
+async def test_job_catch_up():
+    registry = JobRegistry()
+
+    @registry.job(cron="*/5 * * * *", name="test_job_catch_up")
+    async def catch_up():
+        pass
+
+    job = registry.jobs["test_job_catch_up"]
+    # never ran - waits for the next cron time
+    assert await registry._next_run(job) > datetime.utcnow()
+
+    # the last run is long ago - the latest missed run is due right away
+    await registry.run(job, datetime.utcnow() - timedelta(hours=2))
+    missed = await registry._next_run(job)
+    assert datetime.utcnow() - timedelta(minutes=5) < missed <= datetime.utcnow()
+
+    # caught up - back to the next cron time
+    await registry.run(job, missed)
+    assert await registry._next_run(job) > datetime.utcnow()
+
+
+def test_job_runs_endpoint(
+    auth_client_admin: TestClient, client: TestClient, db: sa.orm.Session
+):
+    db.add(
+        models.JobRun(
+            name="test_job_endpoint",
+            scheduled_for=datetime(2021, 6, 1, 12),
+            started_at=datetime(2021, 6, 1, 12, 0, 10),
+            finished_at=datetime(2021, 6, 1, 12, 0, 12),
+            duration=2.0,
+        )
+    )
+    db.commit()
+
+    response = auth_client_admin.get("/job-runs?name=test_job_endpoint")
+    assert response.status_code == status.HTTP_200_OK
+    runs = response.json()
+    assert len(runs) == 1
+    assert runs[0]["duration"] == 2.0
+    assert runs[0]["error"] is None
+
+    response = client.get("/job-runs")
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
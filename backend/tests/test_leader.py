@@ -0,0 +1,54 @@
+import asyncio
+
+import sqlalchemy as sa
+from backend.app.utils.leader import LeaderElection
+
+
+async def _until(condition, timeout: float = 5):
+    for _ in range(int(timeout / 0.05)):
+        if condition():
+            return
+        await asyncio.sleep(0.05)
+    assert condition()
+
+
+async def test_leader_election(async_engine):
+    first = LeaderElection(async_engine, "test-leader", interval=0.05, timeout=2)
+    second = LeaderElection(async_engine, "test-leader", interval=0.05, timeout=2)
+    first.start()
+    await _until(lambda: first.is_leader)
+    second.start()
+    try:
+        await asyncio.sleep(0.3)
+        assert not second.is_leader
+
+        # a graceful stop releases the lock right away
+        await first.stop()
+        assert not first.is_leader
+        await _until(lambda: second.is_leader)
+    finally:
+        await first.stop()
+        await second.stop()
+
+
+async def test_leader_failover(async_engine):
+    first = LeaderElection(async_engine, "test-leader", interval=0.05, timeout=2)
+    second = LeaderElection(async_engine, "test-leader", interval=0.05, timeout=2)
+    first.start()
+    await _until(lambda: first.is_leader)
+    second.start()
+    try:
+        # the session of the leader is gone - as when its node dies
+        async with async_engine.connect() as conn:
+            await conn.execute(
+                sa.text(
+                    "SELECT pg_terminate_backend(pid) FROM pg_locks "
+                    "WHERE locktype = 'advisory' AND objid = :key"
+                ),
+                {"key": first.key},
+            )
+        await _until(lambda: second.is_leader)
+        await _until(lambda: not first.is_leader)
+    finally:
+        await first.stop()
+        await second.stop()
@@ -0,0 +1,31 @@
+import asyncio
+import time
+
+from backend.app.utils.loop_monitor import LoopMonitor, label_task
+from loguru import logger
+from prometheus_client import REGISTRY
+
+
+def _blocking_call():
+    time.sleep(0.3)
+
+
+async def test_loop_monitor():
+    messages = []
+    sink = logger.add(lambda m: messages.append(m.record["message"]), level="WARNING")
+    lag_count = REGISTRY.get_sample_value("event_loop_lag_seconds_count")
+    monitor = LoopMonitor(interval=0.02, threshold=0.1)
+    monitor.start()
+    try:
+        await asyncio.sleep(0.1)
+        with label_task("GET /blocking"):
+            _blocking_call()
+        await asyncio.sleep(0.1)
+    finally:
+        monitor.stop()
+        logger.remove(sink)
+
+    [stall] = [m for m in messages if m.startswith("event loop blocked")]
+    assert "in GET /blocking" in stall
+    assert "_blocking_call" in stall
+    assert REGISTRY.get_sample_value("event_loop_lag_seconds_count") > lag_count
@@ -1,4 +1,9 @@
+import datetime
+
 import pytest
+import sqlalchemy as sa
+from backend.app import models
+from backend.app.core.security import get_password_hash
 from faker import Faker
 from fastapi import status
 from fastapi.testclient import TestClient
@@ -33,11 +38,59 @@ def test_me_get_members(auth_client_basic: TestClient):
     assert response.status_code == 200
 
 
+def test_me_door_token(client: TestClient):
+    # seeded user with a full membership
+    response = client.post(
+        "/auth/token", data={"username": "test3@test.dk", "password": "test"}
+    )
+    token = response.json()["access_token"]
+    headers = {"Authorization": f"bearer {token}"}
+
+    response = client.get("/me/door-token", headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert set(response.json().keys()) == {"token", "expires"}
+
+
+def test_me_door_token_not_started(client: TestClient, db: sa.orm.Session):
+    # only a membership that starts tomorrow - no door access yet
+    user = models.User(
+        name="Not Started",
+        email="not-started@example.com",
+        mobile="+4587654321",
+        hashed_password=get_password_hash("test"),
+        birthday=datetime.date(2000, 1, 1),
+        email_confirmed=True,
+    )
+    db.add(user)
+    db.flush()
+    tomorrow = datetime.date.today() + datetime.timedelta(days=1)
+    member = models.Member(
+        user_id=user.id,
+        product_id=1,
+        date_start=tomorrow,
+        date_end=tomorrow + datetime.timedelta(days=365),
+    )
+    db.add(member)
+    db.commit()
+    try:
+        response = client.post(
+            "/auth/token", data={"username": user.email, "password": "test"}
+        )
+        headers = {"Authorization": f"bearer {response.json()['access_token']}"}
+        response = client.get("/me/door-token", headers=headers)
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+    finally:
+        db.delete(member)
+        db.delete(user)
+        db.commit()
+
+
 @pytest.mark.parametrize("c", [pytest.lazy_fixture("client")])
 def test_no_access(c: TestClient):
     for response in [
         c.get("/me"),
         c.patch("/me", json={"name": "new name"}),
         c.get("/me/members"),
+        c.get("/me/door-token"),
     ]:
         assert response.status_code == status.HTTP_401_UNAUTHORIZED
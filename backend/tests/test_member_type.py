@@ -44,6 +44,28 @@ def test_get_member_type(client: TestClient, member_type_id=1):
     assert response.status_code == status.HTTP_404_NOT_FOUND
 
 
+def test_member_type_etag(auth_client_admin: TestClient, fake_name: str):
+    for url in ["/member-types", "/member-types/1"]:
+        response = auth_client_admin.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        etag = response.headers["etag"]
+
+        # the client already has it
+        response = auth_client_admin.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert response.headers["etag"] == etag
+        assert response.content == b""
+
+        # a change gives a new etag at once
+        response = auth_client_admin.patch("/member-types/1", json={"name": fake_name})
+        assert response.status_code == status.HTTP_200_OK
+        response = auth_client_admin.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["etag"] != etag
+        assert fake_name in response.text
+        fake_name = fake_name[::-1]
+
+
 def test_create_member_type(auth_client_admin: TestClient):
     new_member_type = {"name": "new_member_type", "name_short": "nmt"}
     response = auth_client_admin.post("/member-types", json=new_member_type)
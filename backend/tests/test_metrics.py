@@ -0,0 +1,92 @@
+import pytest
+import sqlalchemy as sa
+from backend.app import models
+from backend.app.core.config import settings
+from backend.app.utils import metrics
+from fastapi import status
+from fastapi.testclient import TestClient
+from prometheus_client.parser import text_string_to_metric_families
+
+
+@pytest.fixture(autouse=True)
+def metrics_api_key(monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_API_KEY", "scrape-me")
+
+
+def _samples(client: TestClient):
+    response = client.get("/metrics", headers={"Authorization": "Bearer scrape-me"})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/plain")
+    return {
+        (sample.name, tuple(sorted(sample.labels.items()))): sample.value
+        for family in text_string_to_metric_families(response.text)
+        for sample in family.samples
+    }
+
+
+def test_metrics(client: TestClient):
+    route = (("method", "GET"), ("route", "/member-types/{member_type_id}"))
+    before = _samples(client)
+
+    client.get("/member-types/1")
+    client.get("/member-types/999999")
+    client.get("/no-such-route")
+
+    after = _samples(client)
+
+    def diff(name, labels=route):
+        return after.get((name, labels), 0) - before.get((name, labels), 0)
+
+    assert diff("http_requests_total", route + (("status", "200"),)) == 1
+    assert diff("http_requests_total", route + (("status", "404"),)) == 1
+    assert diff("http_request_duration_seconds_count") == 2
+    # at least the version of the member types and the member type itself
+    assert diff("http_request_db_statements_sum") >= 2
+    assert diff("http_request_db_duration_seconds_sum") > 0
+    assert diff("db_statement_duration_seconds_count", ()) >= 2
+    unmatched = (("method", "GET"), ("route", "unmatched"), ("status", "404"))
+    assert diff("http_requests_total", unmatched) == 1
+    # only the /metrics request itself
+    in_progress = (("method", "GET"), ("route", "/metrics"))
+    assert after[("http_requests_in_progress", in_progress)] == 1
+
+
+def test_worker_memory(client: TestClient):
+    # updated at most every MEMORY_INTERVAL - the first request always does
+    client.get("/member-types/1")
+    assert _samples(client)[("worker_resident_memory_bytes", ())] > 1024 * 1024
+
+
+def test_metrics_api_key(client: TestClient, monkeypatch):
+    assert client.get("/metrics").status_code == status.HTTP_403_FORBIDDEN
+    response = client.get("/metrics", headers={"Authorization": "Bearer scrape-me"})
+    assert response.status_code == status.HTTP_200_OK
+
+    # no key configured - no scrapes
+    monkeypatch.setattr(settings, "METRICS_API_KEY", None)
+    response = client.get("/metrics", headers={"Authorization": "Bearer scrape-me"})
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+async def test_track_queries(async_db, monkeypatch):
+    monkeypatch.setattr(settings, "QUERY_DEBUG", True)
+    with metrics.track_queries("job") as stats:
+        for user_id in range(3):
+            await async_db.execute(
+                sa.select(models.User.id).where(models.User.id == user_id)
+            )
+        await async_db.execute(sa.select(models.Member.id))
+
+    assert stats.statements == 4
+    [(shape, n)] = stats.repeated(threshold=3)
+    assert n == 3 and 'FROM "user"' in shape
+
+
+def test_max_queries(auth_client_admin: TestClient, max_queries):
+    with max_queries(5) as seen:
+        auth_client_admin.get("/users/1")
+    assert [name for name, _ in seen] == ["GET /users/{user_id}", "test"]
+
+    with pytest.raises(AssertionError, match="ran 5 statements"):
+        with max_queries(4):
+            auth_client_admin.get("/users/1")
@@ -1,7 +1,18 @@
+import asyncio
+import datetime
+import time
+
 import pytest
-from fastapi import status
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from fastapi import Response, status
 from fastapi.testclient import TestClient
 
+from backend.app.core.utils import tz_today
+from backend.app.routers import misc
+from backend.app.routers.misc import opening_hours_cache
+from backend.app.utils.http import HttpClients
+
 
 # @pytest.mark.vcr()
 # def test_opening_hours(client: TestClient):
@@ -9,6 +20,42 @@ from fastapi.testclient import TestClient
 #     assert response.status_code == status.HTTP_200_OK
 
 
+def test_opening_hours_cached(client: TestClient):
+    hours = [{"date": "2021-06-01", "is_open": True, "open": "10", "close": "22"}]
+    today = tz_today()
+    opening_hours_cache._entries[("opening_hours", today)] = (time.monotonic(), hours)
+
+    response = client.get("/opening-hours")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == hours
+    assert "max-age" in response.headers["cache-control"]
+    opening_hours_cache.clear()
+
+
+async def test_opening_hours_new_day(monkeypatch):
+    # the window fetched yesterday is not served after midnight
+    today = tz_today()
+    yesterday = today - datetime.timedelta(days=1)
+    stale = [{"date": str(yesterday), "is_open": True, "open": "10", "close": "22"}]
+    opening_hours_cache._entries[("opening_hours", yesterday)] = (
+        time.monotonic(),
+        stale,
+    )
+    fetched = []
+
+    async def fetch(session, date_from):
+        fetched.append(date_from)
+        return []
+
+    monkeypatch.setattr(misc, "_fetch_opening_hours", fetch)
+    try:
+        assert await misc.opening_hours(Response(), session=None) == []
+        assert fetched == [today]
+        assert ("opening_hours", yesterday) not in opening_hours_cache._entries
+    finally:
+        opening_hours_cache.clear()
+
+
 def test_healtz(client: TestClient):
     response = client.get("/healthz")
     assert response.status_code == status.HTTP_200_OK
@@ -17,3 +64,67 @@ def test_healtz(client: TestClient):
 def test_docs(client: TestClient):
     response = client.get("/docs")
     assert response.status_code == status.HTTP_200_OK
+
+
+async def test_http_clients_pooled():
+    async def hello(request):
+        return web.json_response({"hello": "world"})
+
+    app = web.Application()
+    app.router.add_get("/", hello)
+    clients = HttpClients()
+    async with TestServer(app) as server:
+        session = clients.get("stub")
+        for _ in range(3):
+            async with session.get(server.make_url("/")) as resp:
+                assert (await resp.json()) == {"hello": "world"}
+        # same session is handed out again
+        assert clients.get("stub") is session
+
+        stats = clients.stats()["stub"]
+        assert stats["requests"] == 3
+        assert stats["in_flight"] == 0
+        assert stats["connections_created"] == 1
+        assert stats["connections_reused"] == 2
+        await clients.close()
+    assert session.closed
+
+
+def test_http_clients_other_loop():
+    clients = HttpClients()
+
+    async def get():
+        return clients.get("stub")
+
+    def run(coro):
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(coro)
+        finally:
+            loop.close()
+
+    # a session of a loop that is gone is closed when replaced
+    session = run(get())
+    assert not session.closed
+    replaced = run(get())
+    assert replaced is not session
+    assert session.closed
+    run(clients.close())
+    assert replaced.closed
+
+
+def test_http_clients_stats(auth_client_admin: TestClient, client: TestClient):
+    response = auth_client_admin.get("/http-clients")
+    assert response.status_code == status.HTTP_200_OK
+
+    response = client.get("/http-clients")
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+def test_email_outbox_stats(auth_client_admin: TestClient, client: TestClient):
+    response = auth_client_admin.get("/email-outbox")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["pending"] >= 0
+
+    response = client.get("/email-outbox")
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
@@ -0,0 +1,82 @@
+from types import SimpleNamespace
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from backend.app.core.config import settings
+from backend.app.utils import netseasy
+from backend.app.utils.http import http_clients
+
+PRODUCT = SimpleNamespace(id=1, name="Full membership", price=1000)
+USER = SimpleNamespace(name="Some Monkey", email="monkey@test.dk", mobile="+4512345678")
+
+
+@pytest.fixture
+async def nets_stub(monkeypatch):
+    """local stub of the nets easy payments api"""
+    calls = []
+    responses = []
+
+    async def create_payment(request):
+        calls.append(await request.json())
+        status, body = responses.pop(0) if responses else (201, None)
+        if status == 201:
+            return web.json_response({"paymentId": "a" * 32}, status=201)
+        return web.json_response(body or {}, status=status)
+
+    app = web.Application()
+    app.router.add_post("/v1/payments", create_payment)
+    async with TestServer(app) as server:
+        monkeypatch.setattr(settings, "NETS_EASY_BASE_URL", str(server.make_url("")))
+        yield SimpleNamespace(calls=calls, responses=responses)
+    await http_clients.close()
+
+
+async def test_create_payment_id(nets_stub):
+    payment_id = await netseasy.create_payment_id(1, PRODUCT, USER)
+
+    assert payment_id == "a" * 32
+    assert netseasy.is_payment_id(payment_id)
+    assert nets_stub.calls[0]["order"]["reference"] == "1"
+    assert nets_stub.calls[0]["checkout"]["consumer"]["phoneNumber"]["number"] == (
+        "12345678"
+    )
+
+
+async def test_create_payment_id_retry(nets_stub):
+    # rate limited - the payment was not created
+    nets_stub.responses.extend([(429, None), (429, None)])
+
+    payment_id = await netseasy.create_payment_id(1, PRODUCT, USER)
+
+    assert payment_id == "a" * 32
+    assert len(nets_stub.calls) == 3
+
+
+async def test_create_payment_id_no_retry_after_send(nets_stub):
+    # the payment may have been created - a retry could create a second one
+    nets_stub.responses.append((503, None))
+    with pytest.raises(netseasy.NetsEasyRetryableError):
+        await netseasy.create_payment_id(1, PRODUCT, USER)
+    assert len(nets_stub.calls) == 1
+
+
+async def test_create_payment_id_fail(nets_stub):
+    # client errors is not retried
+    nets_stub.responses.append((400, {"errors": {"amount": ["invalid"]}}))
+    with pytest.raises(netseasy.NetsEasyError):
+        await netseasy.create_payment_id(1, PRODUCT, USER)
+    assert len(nets_stub.calls) == 1
+
+    # give up after a few attempts
+    nets_stub.responses.extend([(429, None)] * netseasy.RETRY_ATTEMPTS)
+    with pytest.raises(netseasy.NetsEasyRateLimitedError):
+        await netseasy.create_payment_id(1, PRODUCT, USER)
+    assert len(nets_stub.calls) == 1 + netseasy.RETRY_ATTEMPTS
+
+
+def test_is_payment_id():
+    assert netseasy.is_payment_id("02a900006091a9a96937598058c4e474")
+    assert not netseasy.is_payment_id("pi_1J0A2uB3jLVglL0orWoxZL4o")
+    assert not netseasy.is_payment_id(None)
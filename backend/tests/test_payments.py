@@ -0,0 +1,225 @@
+import datetime
+import uuid
+from types import SimpleNamespace
+
+import pytest
+import sqlalchemy as sa
+import stripe
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from faker import Faker
+
+from backend.app import crud, cron, models, payments
+from backend.app.core.config import settings
+from backend.app.core.security import get_password_hash
+from backend.app.utils.http import http_clients
+from backend.app.utils.models_utils import PaymentStatusEnum
+
+fake = Faker()
+
+
+@pytest.fixture
+def pending_slots(db: sa.orm.Session):
+    """a new user with a paid and an unpaid slot for each payment provider"""
+    user = db.execute(
+        sa.select(models.User).from_statement(
+            sa.insert(models.User)
+            .values(
+                name=fake.name(),
+                email=fake.email(),
+                mobile="+4542000000",
+                birthday=fake.date_of_birth(),
+                hashed_password=get_password_hash("basic"),
+                email_confirmed=True,
+            )
+            .returning(models.User)
+        )
+    ).scalar_one()
+    payment_ids = {
+        "stripe_paid": f"pi_{uuid.uuid4().hex}",
+        "stripe_pending": f"pi_{uuid.uuid4().hex}",
+        "nets_paid": uuid.uuid4().hex,
+        "nets_pending": uuid.uuid4().hex,
+    }
+    for payment_id in payment_ids.values():
+        db.execute(
+            sa.insert(models.Slot).values(
+                payment_id=payment_id,
+                user_id=user.id,
+                product_id=1,
+                key=uuid.uuid4().hex,
+                payment_status=PaymentStatusEnum.PENDING,
+                reserved_until=datetime.datetime.utcnow() + datetime.timedelta(hours=1),
+            )
+        )
+    db.commit()
+    yield SimpleNamespace(user=user, **payment_ids)
+
+
+@pytest.fixture
+async def provider_stub(monkeypatch, pending_slots):
+    """local stub of the stripe and nets easy apis knowing the test payments"""
+    calls = []
+
+    async def list_payment_intents(request):
+        calls.append(("stripe", dict(request.query)))
+        intents = [
+            (pending_slots.stripe_paid, "succeeded"),
+            (pending_slots.stripe_pending, "requires_payment_method"),
+        ]
+        return web.json_response(
+            {
+                "object": "list",
+                "url": "/v1/payment_intents",
+                "has_more": False,
+                "data": [
+                    {"id": id, "object": "payment_intent", "status": status}
+                    for id, status in intents
+                ],
+            }
+        )
+
+    async def get_payment(request):
+        payment_id = request.match_info["payment_id"]
+        calls.append(("netseasy", payment_id))
+        if payment_id == pending_slots.nets_paid:
+            summary = {"reservedAmount": 1000}
+        elif payment_id == pending_slots.nets_pending:
+            summary = {}
+        else:
+            return web.json_response({}, status=404)
+        return web.json_response(
+            {"payment": {"paymentId": payment_id, "summary": summary}}
+        )
+
+    app = web.Application()
+    app.router.add_get("/v1/payment_intents", list_payment_intents)
+    app.router.add_get("/v1/payments/{payment_id}", get_payment)
+    async with TestServer(app) as server:
+        url = str(server.make_url("")).rstrip("/")
+        monkeypatch.setattr(settings, "NETS_EASY_BASE_URL", url)
+        monkeypatch.setattr(stripe, "api_base", url)
+        monkeypatch.setattr(stripe, "api_key", "sk_test_stub")
+        yield calls
+    await http_clients.close()
+
+
+async def test_reconcile_payments(pending_slots, provider_stub, db: sa.orm.Session):
+    assert await cron.reconcile_payments() >= 2
+
+    # stripe is asked with one list call, nets easy per payment
+    assert len([c for c in provider_stub if c[0] == "stripe"]) == 1
+    assert ("netseasy", pending_slots.nets_paid) in provider_stub
+
+    slots = db.execute(
+        sa.select(models.Slot.payment_id, models.Slot.payment_status)
+        .where(models.Slot.user_id == pending_slots.user.id)
+        .execution_options(populate_existing=True)
+    ).all()
+    status = dict(slots)
+    assert status[pending_slots.stripe_paid] == PaymentStatusEnum.PAID
+    assert status[pending_slots.nets_paid] == PaymentStatusEnum.PAID
+    assert status[pending_slots.stripe_pending] == PaymentStatusEnum.PENDING
+    assert status[pending_slots.nets_pending] == PaymentStatusEnum.PENDING
+
+    # paid through the same path as the webhooks - the second payment of
+    # the same membership extends it
+    members = (
+        db.execute(
+            sa.select(models.Member).where(
+                models.Member.user_id == pending_slots.user.id
+            )
+        )
+        .scalars()
+        .all()
+    )
+    assert len(members) == 1
+    assert members[0].date_end == datetime.date(datetime.date.today().year + 2, 1, 15)
+    emails = db.execute(
+        sa.select(sa.func.count(models.EmailOutbox.id)).where(
+            models.EmailOutbox.to_email == pending_slots.user.email
+        )
+    ).scalar()
+    assert emails == 2
+
+
+async def test_payment_succeeded_event(async_db, user_basic: models.User):
+    event = (await async_db.execute(sa.select(models.Event).limit(1))).scalar_one()
+    payment_id = f"pi_{uuid.uuid4().hex}"
+    await async_db.execute(
+        sa.insert(models.Slot).values(
+            payment_id=payment_id,
+            user_id=user_basic.id,
+            product_id=event.id,
+            key=uuid.uuid4().hex,
+            payment_status=PaymentStatusEnum.PENDING,
+            reserved_until=datetime.datetime.utcnow() + datetime.timedelta(hours=1),
+        )
+    )
+
+    assert await payments.payment_succeeded(async_db, payment_id)
+
+    member = (
+        await async_db.execute(
+            sa.select(models.Member).where(models.Member.payment_id == payment_id)
+        )
+    ).scalar_one()
+    assert member.date_start == event.date_start.date()
+    assert member.date_end == event.date_end.date()
+
+    # the slot is paid now
+    with pytest.raises(payments.SlotNotFound):
+        await payments.payment_succeeded(async_db, payment_id)
+
+
+async def test_reconcile_payments_error_recorded(pending_slots, monkeypatch):
+    from backend.app.main import registry
+
+    async def provider_down(slots):
+        raise RuntimeError("provider down")
+
+    monkeypatch.setattr(cron, "paid_payment_ids", provider_down)
+
+    # a failed reconcile is a failed job run - not a quiet success
+    job = registry.jobs["reconcile_payments"]
+    run = await registry.run(job, datetime.datetime.utcnow().replace(microsecond=0))
+    assert "RuntimeError: provider down" in run.error
+
+
+async def test_process_inbox_commits_per_event(monkeypatch):
+    from backend.app.deps import get_db_context
+
+    async with get_db_context() as db:
+        ids = [
+            await crud.webhook_inbox.create_ignore(
+                db,
+                {
+                    "provider": "test",
+                    "event_id": uuid.uuid4().hex,
+                    "event_type": "test.event",
+                    "payload": {},
+                },
+            )
+            for _ in range(2)
+        ]
+        await db.commit()
+
+    seen = []
+
+    async def apply(db, event):
+        # the events before are already committed when the next is applied
+        async with get_db_context() as other:
+            processed = await other.execute(
+                sa.select(models.WebhookInbox.id).where(
+                    models.WebhookInbox.id.in_(ids),
+                    models.WebhookInbox.processed_at != None,
+                )
+            )
+            seen.append((event.id, set(processed.scalars())))
+
+    monkeypatch.setattr(payments, "apply_webhook_event", apply)
+    async with get_db_context() as db:
+        await payments.process_inbox(db)
+
+    assert (ids[0], set()) in seen
+    assert (ids[1], {ids[0]}) in seen
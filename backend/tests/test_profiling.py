@@ -0,0 +1,38 @@
+from backend.app.core.config import settings
+from fastapi import status
+from fastapi.testclient import TestClient
+
+
+def test_profile_request(auth_client_admin: TestClient, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "PROFILING_DIR", str(tmp_path))
+
+    response = auth_client_admin.get("/users", params={"profile": 1})
+    assert response.status_code == status.HTTP_200_OK
+    name = response.headers["x-profile"]
+    assert name.endswith("-GET-users.folded")
+
+    response = auth_client_admin.get("/profiles")
+    assert response.json() == [name]
+
+    response = auth_client_admin.get(f"/profiles/{name}")
+    assert response.status_code == status.HTTP_200_OK
+    # folded stacks - "frame;frame;frame count"
+    stack, count = response.text.splitlines()[0].rsplit(" ", 1)
+    assert int(count) > 0
+    assert ";" in stack
+
+    response = auth_client_admin.get("/profiles/..%2F..%2Fetc%2Fpasswd")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_profile_only_admin(
+    auth_client_basic: TestClient, client: TestClient, tmp_path, monkeypatch
+):
+    monkeypatch.setattr(settings, "PROFILING_DIR", str(tmp_path))
+
+    for c in [auth_client_basic, client]:
+        response = c.get("/member-types", headers={"X-Profile": "1"})
+        assert response.status_code == status.HTTP_200_OK
+        assert "x-profile" not in response.headers
+        assert c.get("/profiles").status_code == status.HTTP_401_UNAUTHORIZED
+    assert not list(tmp_path.iterdir())
@@ -0,0 +1,41 @@
+import json
+
+import sqlalchemy as sa
+from fastapi.encoders import jsonable_encoder
+
+from backend.app import crud, models, schemas
+from backend.app.utils.serializer import ORJSONResponse, get_serializer, included
+
+
+async def test_serializer_matches_pydantic(async_db):
+    page = await crud.user.get_multi_page(
+        async_db,
+        options=[
+            sa.orm.selectinload(models.User.member).selectinload(models.Member.product)
+        ],
+        per_page=1000,
+        order_by=[models.User.name.asc(), models.User.id.asc()],
+    )
+    assert any(user.member for user in page["items"])
+
+    schema = schemas.Page[schemas.User]
+    expected = jsonable_encoder(schema.parse_obj(page))
+    fast = json.loads(ORJSONResponse(get_serializer(schema)(page)).body)
+
+    assert fast == expected
+    # generated once per schema
+    assert get_serializer(schema) is get_serializer(schema)
+
+
+def test_included():
+    # no sparse fieldset - everything as before
+    assert included(None, None, "member.product")
+    # only fields - the relations named
+    assert included(frozenset(["name", "member"]), None, "member.product")
+    assert not included(frozenset(["name"]), None, "member")
+    assert included(frozenset(["member.date_end"]), None, "member")
+    assert not included(frozenset(["member.date_end"]), None, "member.product")
+    # expand - the relations listed and their parents
+    assert included(None, frozenset(["member.product"]), "member")
+    assert not included(None, frozenset(["member"]), "member.product")
+    assert not included(None, frozenset(), "member")
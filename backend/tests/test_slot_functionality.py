@@ -1,4 +1,7 @@
 import datetime
+import uuid
+from types import SimpleNamespace
+from unittest import mock
 
 import pytest
 import sqlalchemy as sa
@@ -8,6 +11,8 @@ from pytest_pgsql.time import SQLAlchemyFreezegun
 
 from backend.app import crud, models
 from backend.app.db.base import engine
+from backend.app.utils import stripe
+from backend.app.utils.models_utils import PaymentStatusEnum
 
 
 @pytest.mark.vcr()
@@ -53,6 +58,38 @@ def test_slots(auth_client_basic: TestClient):
         assert response.status_code == status.HTTP_404_NOT_FOUND
 
 
+@pytest.mark.parametrize("intent_status", ["processing", "succeeded"])
+def test_slot_payment_intent_in_progress(
+    db, user_basic, auth_client_basic: TestClient, intent_status
+):
+    slot_key = uuid.uuid4().hex
+    db.execute(
+        sa.insert(models.Slot).values(
+            payment_id="pi_in_progress",
+            user_id=user_basic.id,
+            product_id=1,
+            key=slot_key,
+            payment_status=PaymentStatusEnum.PENDING,
+            reserved_until=datetime.datetime.utcnow() + datetime.timedelta(hours=1),
+        )
+    )
+    db.commit()
+
+    intent = SimpleNamespace(status=intent_status, client_secret="secret")
+    with mock.patch.object(
+        stripe, "retrieve_payment_intent", mock.AsyncMock(return_value=intent)
+    ), mock.patch.object(stripe, "create_payment_intent") as create:
+        response = auth_client_basic.post(f"/slots/{slot_key}/create-payment-intent")
+
+    # the intent may already be paid - it must not be replaced
+    assert response.status_code == status.HTTP_409_CONFLICT
+    assert create.call_count == 0
+    payment_id = db.execute(
+        sa.select(models.Slot.payment_id).where(models.Slot.key == slot_key)
+    ).scalar_one()
+    assert payment_id == "pi_in_progress"
+
+
 def test_member(db, client, user_admin):
 
     response = client.post(
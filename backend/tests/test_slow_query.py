@@ -0,0 +1,42 @@
+import sqlalchemy as sa
+from backend.app import models
+from backend.app.core.config import settings
+from backend.app.utils import metrics
+from backend.app.utils.slow_query import _explainable, slow_queries
+from loguru import logger
+
+
+def test_explainable():
+    assert _explainable("SELECT 1")
+    assert not _explainable("SELECT id FROM slot FOR UPDATE SKIP LOCKED")
+    assert not _explainable("UPDATE slot SET user_id = 1")
+    assert not _explainable("WITH paid AS (UPDATE slot SET ...) SELECT 1")
+    # the leader election - the lock would outlive the explain on the pool
+    assert not _explainable("SELECT pg_try_advisory_lock($1) AS pg_try_advisory_lock_1")
+    assert not _explainable("SELECT pg_advisory_unlock($1) AS pg_advisory_unlock_1")
+    assert not _explainable("SELECT nextval('slot_id_seq')")
+
+
+async def test_slow_query_log(async_db, monkeypatch):
+    monkeypatch.setattr(settings, "SLOW_QUERY_THRESHOLD", 0)
+    monkeypatch.setattr(settings, "SLOW_QUERY_EXPLAIN", True)
+    messages = []
+    sink = logger.add(lambda m: messages.append(m.record["message"]), level="WARNING")
+    try:
+        with metrics.track_queries("GET /users/{user_id}"):
+            await async_db.execute(
+                sa.select(models.User.id).where(models.User.id == 1).limit(1)
+            )
+            await async_db.execute(sa.select(models.User.id).limit(1))
+        await slow_queries.wait()
+    finally:
+        logger.remove(sink)
+
+    slow = [m for m in messages if m.startswith("slow query")]
+    assert len(slow) == 2
+    assert "in GET /users/{user_id}: SELECT" in slow[0]
+    plans = [m for m in messages if m.startswith("plan of slow query")]
+    assert len(plans) == 2
+    assert "Buffers" in plans[0] or "actual time" in plans[0]
+    # the explain itself is neither counted nor logged
+    assert not any("EXPLAIN" in m for m in slow)
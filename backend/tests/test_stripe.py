@@ -0,0 +1,34 @@
+from types import SimpleNamespace
+from unittest import mock
+
+from backend.app.utils import stripe
+
+
+@mock.patch("stripe.Customer.modify")
+@mock.patch("stripe.Customer.create", return_value=SimpleNamespace(id="cus_1"))
+async def test_sync_customer(mock_create, mock_modify):
+    user = SimpleNamespace(
+        id=1,
+        email="monkey@test.dk",
+        name="Some Monkey",
+        stripe_customer_id=None,
+        stripe_customer_fingerprint=None,
+    )
+
+    # first time the customer is created
+    changes = await stripe.sync_customer(user)
+    assert changes["stripe_customer_id"] == "cus_1"
+    assert mock_create.call_count == 1
+    user.__dict__.update(changes)
+
+    # nothing changed - so no calls to stripe
+    assert await stripe.sync_customer(user) == {}
+    assert mock_modify.call_count == 0
+
+    # the name changed - update the customer in stripe
+    user.name = "Another Monkey"
+    changes = await stripe.sync_customer(user)
+    assert changes["stripe_customer_fingerprint"] != user.stripe_customer_fingerprint
+    mock_modify.assert_called_once_with(
+        "cus_1", email="monkey@test.dk", name="Another Monkey"
+    )
@@ -1,10 +1,13 @@
 import datetime
-from unittest import mock
 
 import pytest
+import sqlalchemy as sa
 from backend.app import models, crud
 from backend.app.db.base import engine, AsyncSession
+from backend.app.core.config import settings
 from backend.app.core.security import generate_signup_confirm_token
+from backend.app.core.utils import MailTemplateEnum
+from backend.app.identicon import identicon_key
 from faker import Faker
 from fastapi import status
 from fastapi.encoders import jsonable_encoder
@@ -60,6 +63,14 @@ def test_get_users(auth_client_admin: TestClient):
     assert items_ids_1 & items_ids_2 == set()
 
 
+def test_get_users_query_budget(auth_client_admin: TestClient, max_queries):
+    # auth, count, page and the eager loads of member and product
+    with max_queries(6):
+        auth_client_admin.get("/users")
+    with max_queries(5):
+        auth_client_admin.get("/users/1")
+
+
 def test_get_users_page_size(auth_client_admin: TestClient):
     response = auth_client_admin.get("/users", params={"per_page": 10})
     assert response.status_code == status.HTTP_200_OK
@@ -69,6 +80,41 @@ def test_get_users_page_size(auth_client_admin: TestClient):
     assert len(data["items"]) == 10
 
 
+def test_get_users_fieldset(auth_client_admin: TestClient):
+    # only the plain fields asked for - no relations loaded
+    response = auth_client_admin.get("/users", params={"fields": "name,email"})
+    assert response.status_code == status.HTTP_200_OK
+    for item in response.json()["items"]:
+        assert set(item) == {"name", "email"}
+
+    # memberships but not their product
+    response = auth_client_admin.get(
+        "/users", params={"fields": "name", "expand": "member"}
+    )
+    items = response.json()["items"]
+    assert all(set(item) == {"name", "member"} for item in items)
+    members = [m for item in items for m in item["member"]]
+    assert members and all("product" not in m for m in members)
+
+    # explicit expand of the product
+    response = auth_client_admin.get(
+        "/users", params={"fields": "name", "expand": "member.product"}
+    )
+    members = [m for item in response.json()["items"] for m in item["member"]]
+    assert members and all(m["product"]["id"] for m in members)
+
+    # empty fields - the same as leaving it out
+    everything = auth_client_admin.get("/users").json()["items"]
+    response = auth_client_admin.get("/users", params={"fields": ""})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["items"] == everything
+    assert any(item["member"] for item in everything)
+
+    # expand nothing
+    response = auth_client_admin.get("/users", params={"expand": ""})
+    assert all("member" not in item for item in response.json()["items"])
+
+
 def test_create_user(auth_client_admin: TestClient, client: TestClient):
     faker = Faker()
     new_user_dict = {
@@ -113,13 +159,44 @@ def test_update_user(auth_client_admin: TestClient, fake_name):
     assert data2["name"] == fake_name
 
 
-def test_identicon(client: TestClient):
+def test_identicon(client: TestClient, db: sa.orm.Session):
     response = client.get("/users/1/identicon.png")
     assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "image/png"
+    # the email can change - revalidated with the etag, never immutable
+    assert response.headers["cache-control"] == (
+        f"public, max-age={settings.IDENTICON_MAX_AGE}"
+    )
+    etag = response.headers["etag"]
+    # the etag is public - it must not be the unsalted hash of the email
+    email = db.execute(sa.select(models.User.email).where(models.User.id == 1))
+    assert identicon_key(email.scalar_one()) not in etag
+
+    response = client.get("/users/1/identicon.png", headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    response = client.get("/users/999999/identicon.png")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    inactive = models.User(
+        name="Inactive",
+        email="inactive-identicon@example.com",
+        mobile="+4512345678",
+        hashed_password="-",
+        birthday=datetime.date(2000, 1, 1),
+        active=False,
+    )
+    db.add(inactive)
+    db.commit()
+    try:
+        response = client.get(f"/users/{inactive.id}/identicon.png")
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+    finally:
+        db.delete(inactive)
+        db.commit()
 
 
-@mock.patch("backend.app.core.utils._sendgrid_send")
-def test_signup(mock_mail_send, client: TestClient):
+def test_signup(client: TestClient, db: sa.orm.Session):
     faker = Faker()
     new_user_dict = {
         "name": faker.name(),
@@ -136,7 +213,13 @@ def test_signup(mock_mail_send, client: TestClient):
     for x in ["name", "email", "birthday"]:
         assert data[x] == str(new_user_dict[x])
 
-    assert mock_mail_send.called
+    # the confirm email is queued in the outbox
+    outbox = db.execute(
+        sa.select(models.EmailOutbox).where(
+            models.EmailOutbox.to_email == new_user_dict["email"]
+        )
+    ).scalar_one()
+    assert outbox.template_id == MailTemplateEnum.CONFIRM_SIGNUP
 
     # test login this new user (denied because email not confirmed yet)
     response = client.post(
@@ -2,17 +2,19 @@ import json
 import random
 import string
 import time
-from unittest import mock
+import uuid
 
 from loguru import logger
 
 import pytest
+import sqlalchemy as sa
 from fastapi import status
 from fastapi.testclient import TestClient
 from stripe.webhook import WebhookSignature
 
 from backend.app import models
 from backend.app.core.config import settings
+from backend.app.core.utils import MailTemplateEnum
 
 PAYMENT_INTENT_CREATED = {
     "id": "evt_1J0A2uB3jLVglL0odkBjie9i",
@@ -84,6 +86,31 @@ PAYMENT_INTENT_SUCCEEDED = PAYMENT_INTENT_CREATED.copy()
 PAYMENT_INTENT_SUCCEEDED["type"] = "payment_intent.succeeded"
 
 
+def _event_id(prefix: str = "") -> str:
+    # webhook events are deduplicated by their id
+    return f"{prefix}{uuid.uuid4().hex}"
+
+
+def _inbox(db: sa.orm.Session, provider: str, event_id: str):
+    query = sa.select(models.WebhookInbox).where(
+        models.WebhookInbox.provider == provider,
+        models.WebhookInbox.event_id == event_id,
+    )
+    return db.execute(query).scalars().all()
+
+
+def _outbox_count(db: sa.orm.Session, slot: models.Slot) -> int:
+    # the payment succeeded email is queued together with the payment
+    query = sa.select(sa.func.count(models.EmailOutbox.id)).where(
+        models.EmailOutbox.to_email == models.User.email,
+        models.EmailOutbox.template_id == MailTemplateEnum.PAYMENT_SUCCEEDED,
+        models.EmailOutbox.data["product_name"].astext == models.Product.name,
+        models.User.id == slot.user_id,
+        models.Product.id == slot.product_id,
+    )
+    return db.execute(query).scalar()
+
+
 def _webhook_post(client: TestClient, payload: dict, make_invalid=False):
     data = json.dumps(payload)
     timestamp = int(time.time())
@@ -102,24 +129,33 @@ def _webhook_post(client: TestClient, payload: dict, make_invalid=False):
     return client.post("/webhook/stripe", headers=headers, data=data)
 
 
-@mock.patch("backend.app.core.utils._sendgrid_send")
 def test_webhook_payment_intent_succeeded(
-    mock_mail_send,
     client: TestClient,
     auth_client_basic: TestClient,
     slot_with_stripe_id: models.Slot,
+    db: sa.orm.Session,
 ):
     # this doesnt do anything currently but should return 200
+    PAYMENT_INTENT_CREATED["id"] = _event_id("evt_")
     response = _webhook_post(client, PAYMENT_INTENT_CREATED)
     assert response.status_code == status.HTTP_200_OK
 
     # response = _webhook_post(client, PAYMENT_INTENT_FAILED)
     # assert response.status_code == status.HTTP_200_OK
 
+    PAYMENT_INTENT_SUCCEEDED["id"] = _event_id("evt_")
     PAYMENT_INTENT_SUCCEEDED["data"]["object"]["id"] = slot_with_stripe_id.payment_id
     response = _webhook_post(client, PAYMENT_INTENT_SUCCEEDED)
     assert response.status_code == status.HTTP_200_OK
-    assert mock_mail_send.called
+    assert _outbox_count(db, slot_with_stripe_id) == 1
+
+    # a redelivery is acked but not applied again
+    response = _webhook_post(client, PAYMENT_INTENT_SUCCEEDED)
+    assert response.status_code == status.HTTP_200_OK
+    (event,) = _inbox(db, "stripe", PAYMENT_INTENT_SUCCEEDED["id"])
+    assert event.processed_at is not None
+    assert event.error is None
+    assert _outbox_count(db, slot_with_stripe_id) == 1
 
     # check this user is now member of product 1
     response = auth_client_basic.get("/me")
@@ -189,12 +225,12 @@ NETS_EVENT_COMPLETED = {
 }
 
 
-@mock.patch("backend.app.core.utils._sendgrid_send")
 def test_nets_webhook_success(
-    mock_mail_send,
     client: TestClient,
     slot_with_nets_id: models.Slot,
+    db: sa.orm.Session,
 ):
+    NETS_EVENT_COMPLETED["id"] = _event_id()
     NETS_EVENT_COMPLETED["data"]["paymentId"] = slot_with_nets_id.payment_id
 
     headers = {"Authorization": f"Bearer {settings.NETS_EASY_WEBHOOK_SECRET}"}
@@ -204,4 +240,19 @@ def test_nets_webhook_success(
 
     assert response.status_code == status.HTTP_200_OK
 
-    assert mock_mail_send.called
+    assert _outbox_count(db, slot_with_nets_id) == 1
+
+
+def test_webhook_unknown_payment(client: TestClient, db: sa.orm.Session):
+    event = json.loads(json.dumps(PAYMENT_INTENT_SUCCEEDED))
+    event["id"] = _event_id("evt_")
+    event["data"]["object"]["id"] = _event_id("pi_")
+
+    for _ in range(2):
+        response = _webhook_post(client, event)
+        assert response.status_code == status.HTTP_200_OK
+
+    # stored once and marked as processed so it is not retried
+    (stored,) = _inbox(db, "stripe", event["id"])
+    assert stored.processed_at is not None
+    assert stored.error == "slot not found"